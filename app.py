@@ -346,14 +346,15 @@ if uploaded_file is not None:
         with tab2:
             st.json(extracted_data)
             
-            # Guardar JSON
+            # Guardar JSON (se serializa una vez: mismo texto para archivo y descarga)
+            json_payload = json.dumps(extracted_data, indent=2, ensure_ascii=False)
             json_path = os.path.join("output/json", f"factura_{timestamp}.json")
             with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(extracted_data, f, indent=2, ensure_ascii=False)
+                f.write(json_payload)
             
             st.download_button(
                 "⬇️ Descargar JSON",
-                json.dumps(extracted_data, indent=2, ensure_ascii=False),
+                json_payload,
                 f"factura_{timestamp}.json",
                 "application/json",
                 use_container_width=True
@@ -375,13 +376,14 @@ if uploaded_file is not None:
             st.table(validations_data)
             
             # Guardar reporte de validación
+            validation_payload = json.dumps(validation_result, indent=2, ensure_ascii=False)
             validation_path = os.path.join("output/validations", f"validation_{timestamp}.json")
             with open(validation_path, "w", encoding="utf-8") as f:
-                json.dump(validation_result, f, indent=2, ensure_ascii=False)
+                f.write(validation_payload)
             
             st.download_button(
                 "⬇️ Descargar Reporte de Validación",
-                json.dumps(validation_result, indent=2, ensure_ascii=False),
+                validation_payload,
                 f"validation_{timestamp}.json",
                 "application/json",
                 use_container_width=True
@@ -6,6 +6,83 @@ import re
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+# Los patrones se evalúan sobre una copia del texto en minúsculas (sin re.I,
+# que obliga a comparar sin distinguir mayúsculas carácter por carácter).
+# Cuando el valor capturado es texto, se recorta del original con los mismos
+# offsets para conservar las mayúsculas.
+# Cualquier secuencia de espacios, tabs o saltos de línea
+_RE_WS = re.compile(r'\s+')
+
+_RE_TOTALS_ROW = re.compile(r'(SUB-TOTAL|SUBTOTAL|IVA|TOTAL|0\s*-\s*,)')
+_RE_TOTAL_WORDS = re.compile(r'(SUB-TOTAL|SUBTOTAL|IVA|TOTAL)')
+_RE_FALLBACK_ITEM = re.compile(r"(flete|gastos|cleaning|gate)[^\d]*([\d,.]+)")
+_RE_NIT_ALT = re.compile(r"nit[.\s]*[:\-]?\s*([\d\-.]+)")
+_RE_PROVEEDOR_ALT = re.compile(r"(fabricante|proveedor|empresa|shipper)[:\.]?\s*(.{5,50})")
+
+_RE_FACTURA_ELECTRONICA = re.compile(r'factura\s+electronica[^\n]*\n\s*(\d{2}\s+\d{5,})')
+_INVOICE_PATTERNS = (
+    re.compile(r'invoice[:\s]+([a-z0-9\-]+)'),
+    re.compile(r'factura[:\s]+([a-z0-9\-]+)'),
+    re.compile(r'\b(inv-?\d{4,8})\b'),
+    re.compile(r'no\.\s*factura[:\s]*(\d{5,})'),
+)
+_DATE_PATTERNS = (
+    re.compile(r'(\d{2}/\d{2}/\d{4})\s+\d{1,2}:\d{2}:\d{2}\s+[ap]m'),
+    re.compile(r'date[:\s]+(\d{4}[-/]\d{2}[-/]\d{2})'),
+    re.compile(r'date[:\s]+(\d{2}[-/]\d{2}[-/]\d{4})'),
+    re.compile(r'fecha[:\s]+(\d{2}[-/]\d{2}[-/]\d{4})'),
+    re.compile(r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})'),
+)
+_RE_SHIPPER = re.compile(r'shipper:\s*(.+?)(?:origen|port|$)')
+_RE_PROVIDER = re.compile(r'(fabricante|proveedor):\s*(.+)')
+_NIT_PATTERNS = (
+    re.compile(r'nit[.\s]*[:\-]?\s*([\d\-.]+)'),
+    re.compile(r'tax\s*id:\s*([0-9\-]+)'),
+    re.compile(r'nit:\s*([\d\-.]+)'),
+)
+_RE_ADDR_STREET = re.compile(r'(cr|calle|carrera|av|avenida)\s+[\d\s\-]+(?:\s+\d+)?')
+_ADDR_LABEL_PATTERNS = (
+    re.compile(r'direccion:\s*(.+)'),
+    re.compile(r'address:\s*(.+)'),
+)
+_SUBTOTAL_PATTERNS = (
+    re.compile(r'sub-total[:\s]+usd?\s*([\d,]+\.?\d*)'),
+    re.compile(r'subtotal[:\s]+\$?\s*([\d,]+\.?\d*)'),
+    re.compile(r'net\s*worth[:\s]+([\d,]+\.?\d*)'),
+)
+_RE_IVA_LINE = re.compile(r'^iva\s+usd\s+([\d,]+\.?\d*)$')
+_VAT_PATTERNS = (
+    re.compile(r'iva\s+usd\s*([\d,]+\.?\d*)'),
+    re.compile(r'vat[:\s]+\$?\s*([\d,]+\.?\d*)'),
+)
+_TOTAL_PATTERNS = (
+    re.compile(r'total\s+usd\s*([\d,]+\.?\d*)'),
+    re.compile(r'total[:\s]+\$?\s*([\d,]+\.?\d*)'),
+    re.compile(r'gross\s*worth[:\s]+([\d,]+\.?\d*)'),
+)
+_RE_USD = re.compile(r'\busd\b')
+_RE_COP = re.compile(r'\bcop\b')
+_RE_EUR = re.compile(r'\beur\b')
+_RE_ITEMS_START = re.compile(r'codigo\s+descipcion|descripcion|description')
+_RE_ITEMS_END = re.compile(r'practicar|resolucion|fecha limite|cufe|tasa:')
+
+
+def _lower_aligned(text: str) -> str:
+    """
+    Minúsculas con la misma longitud que el original (offsets alineados).
+    Los caracteres cuya minúscula ocupa más de uno (p. ej. 'İ') se dejan igual.
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _original_group(match, source: str, group: int = 0) -> str:
+    """Recupera un grupo del match con las mayúsculas del texto original."""
+    return source[match.start(group):match.end(group)]
+
+
 def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
     """
     Extrae campos semánticos de una factura.
@@ -17,18 +94,21 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
         return _empty_invoice()
     
     lines = text.split('\n')
+    # Misma longitud que text, así que las líneas quedan alineadas una a una
+    text_lc = _lower_aligned(text)
+    lines_lc = text_lc.split('\n')
     
     data = {
-        "numero_factura": _extract_invoice_number(text, lines),
-        "fecha_emision": _extract_date(text, lines),
-        "proveedor": _extract_provider(text, lines),
-        "nit_proveedor": _extract_client_nit(text, lines),
-        "direccion_proveedor": _extract_address(text, lines),
+        "numero_factura": _extract_invoice_number(text, lines, lines_lc),
+        "fecha_emision": _extract_date(text, lines, lines_lc),
+        "proveedor": _extract_provider(text, lines, text_lc, lines_lc),
+        "nit_proveedor": _extract_client_nit(text_lc),
+        "direccion_proveedor": _extract_address(text, lines, text_lc, lines_lc),
         "subtotal": "0.00",
         "impuestos": "0.00",
         "total": "0.00",
-        "moneda": _extract_currency(text),
-        "items": _extract_items_from_table(text, lines)
+        "moneda": _extract_currency(text_lc),
+        "items": _extract_items_from_table(text, lines, lines_lc)
     }
     
     print("\n=== DEBUG: Primeras 15 lineas del documento ===")
@@ -51,15 +131,13 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
     # Extraer totales de los items ANTES de filtrarlos
     for item in data["items"]:
         if isinstance(item, dict):
-            desc = item.get('descripcion', '').upper().strip()
+            # Un solo espacio entre palabras, sin bordes ni puntos finales
+            desc = _RE_WS.sub(' ', item.get('descripcion', '').upper()).strip().rstrip('.').rstrip()
             item_total = item.get('total', '0.00')
             
             if isinstance(item_total, (int, float)):
                 item_total = str(item_total)
             
-            desc = desc.rstrip('.').strip()
-            desc = re.sub(r'\s+', ' ', desc)
-            
             print(f"DEBUG: Analizando '{desc}' con total '{item_total}'")
             
             if 'TOTAL USD' in desc or desc == 'TOTAL' or ('TOTAL' in desc and 'SUB' not in desc):
@@ -91,7 +169,7 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
     for item in data["items"]:
         if isinstance(item, dict):
             desc = item.get('descripcion', '').upper()
-            if not re.search(r'(SUB-TOTAL|SUBTOTAL|IVA|TOTAL|0\s*-\s*,)', desc, re.IGNORECASE):
+            if not _RE_TOTALS_ROW.search(desc):
                 filtered_items.append(item)
     
     data["items"] = filtered_items
@@ -101,7 +179,7 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
     
     # Fallback para totales si no se encontraron en los items
     if data["total"] == "0.00":
-        alt_total = _extract_gross_worth(text, lines)
+        alt_total = _extract_gross_worth(lines_lc)
         if alt_total:
             data["total"] = str(alt_total)
         else:
@@ -115,21 +193,21 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
                 pass
     
     if data["subtotal"] == "0.00":
-        alt_subtotal = _extract_net_worth(text, lines)
+        alt_subtotal = _extract_net_worth(lines_lc)
         if alt_subtotal:
             data["subtotal"] = str(alt_subtotal)
     
     if data["impuestos"] == "0.00":
-        alt_impuestos = _extract_vat(text, lines)
+        alt_impuestos = _extract_vat(lines, lines_lc)
         if alt_impuestos:
             data["impuestos"] = str(alt_impuestos)
     
     # Fallback para items si no se encontraron
     if not data.get("items"):
         fallback_items = []
-        for m in re.finditer(r"(FLETE|GASTOS|CLEANING|GATE)[^\d]*([\d,.]+)", text, re.I):
-            desc = m.group(1).strip()
-            if not re.search(r'(SUB-TOTAL|SUBTOTAL|IVA|TOTAL)', desc, re.IGNORECASE):
+        for m in _RE_FALLBACK_ITEM.finditer(text_lc):
+            desc = _original_group(m, text, 1).strip()
+            if not _RE_TOTAL_WORDS.search(desc.upper()):
                 fallback_items.append({
                     "descripcion": desc,
                     "cantidad": "N/A",
@@ -154,14 +232,14 @@ def extract_semantic_data(ocr_output: Dict[str, Any]) -> Dict[str, Any]:
     
     # Fallbacks adicionales
     if not data.get("nit_proveedor"):
-        nit_alt = re.search(r"NIT[.\s]*[:\-]?\s*([\d\-.]+)", text, re.I)
+        nit_alt = _RE_NIT_ALT.search(text_lc)
         if nit_alt:
             data["nit_proveedor"] = nit_alt.group(1).strip()
     
     if not data.get("proveedor"):
-        proveedor_alt = re.search(r"(fabricante|proveedor|empresa|shipper)[:\.]?\s*(.{5,50})", text, re.I)
+        proveedor_alt = _RE_PROVEEDOR_ALT.search(text_lc)
         if proveedor_alt:
-            data["proveedor"] = proveedor_alt.group(2).strip()
+            data["proveedor"] = _original_group(proveedor_alt, text, 2).strip()
     
     if not data.get("fecha_emision"):
         fechas = re.findall(r"\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4}", text)
@@ -198,8 +276,9 @@ def _empty_invoice() -> Dict[str, Any]:
         "items": []
     }
 
-def _extract_invoice_number(text: str, lines: List[str]) -> Optional[str]:
+def _extract_invoice_number(text: str, lines: List[str], lines_lc: List[str]) -> Optional[str]:
     header = '\n'.join(lines[:25])
+    header_lc = '\n'.join(lines_lc[:25])
     
     match = re.search(r'\b(\d{2})\s+(\d{5,})\b', header)
     if match:
@@ -207,7 +286,7 @@ def _extract_invoice_number(text: str, lines: List[str]) -> Optional[str]:
         if 'FACTURA' in header[:header.find(match.group(0)) + 100]:
             return factura_num
     
-    match = re.search(r'FACTURA\s+ELECTRONICA[^\n]*\n\s*(\d{2}\s+\d{5,})', header, re.IGNORECASE)
+    match = _RE_FACTURA_ELECTRONICA.search(header_lc)
     if match:
         return match.group(1).replace(' ', '')
     
@@ -217,35 +296,21 @@ def _extract_invoice_number(text: str, lines: List[str]) -> Optional[str]:
         if line_match:
             return line_match.group(1) + line_match.group(2)
     
-    patterns = [
-        r'Invoice[:\s]+([A-Z0-9\-]+)',
-        r'Factura[:\s]+([A-Z0-9\-]+)',
-        r'\b(INV-?\d{4,8})\b',
-        r'No\.\s*Factura[:\s]*(\d{5,})',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, header, re.IGNORECASE | re.MULTILINE)
+    for pattern in _INVOICE_PATTERNS:
+        match = pattern.search(header_lc)
         if match:
-            return match.group(1).replace(' ', '')
+            return _original_group(match, header, 1).replace(' ', '')
     
     return "ELECTRONICA"
 
-def _extract_date(text: str, lines: List[str]) -> Optional[str]:
+def _extract_date(text: str, lines: List[str], lines_lc: List[str]) -> Optional[str]:
     header = '\n'.join(lines[:20])
+    header_lc = '\n'.join(lines_lc[:20])
     
-    patterns = [
-        r'(\d{2}/\d{2}/\d{4})\s+\d{1,2}:\d{2}:\d{2}\s+[AP]M',
-        r'Date[:\s]+(\d{4}[-/]\d{2}[-/]\d{2})',
-        r'Date[:\s]+(\d{2}[-/]\d{2}[-/]\d{4})',
-        r'FECHA[:\s]+(\d{2}[-/]\d{2}[-/]\d{4})',
-        r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{4})',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, header, re.IGNORECASE)
+    for pattern in _DATE_PATTERNS:
+        match = pattern.search(header_lc)
         if match:
-            date_str = match.group(1)
+            date_str = _original_group(match, header, 1)
             try:
                 if '/' in date_str or '-' in date_str:
                     parts = re.split(r'[-/]', date_str)
@@ -261,53 +326,44 @@ def _extract_date(text: str, lines: List[str]) -> Optional[str]:
     
     return None
 
-def _extract_provider(text: str, lines: List[str]) -> Optional[str]:
-    for i, line in enumerate(lines[:10]):
-        if re.search(r'Seller:', line, re.IGNORECASE):
+def _extract_provider(text: str, lines: List[str], text_lc: str, lines_lc: List[str]) -> Optional[str]:
+    for i, line_lc in enumerate(lines_lc[:10]):
+        if 'seller:' in line_lc:
             if i + 1 < len(lines):
                 provider = lines[i + 1].strip()
                 if provider and len(provider) > 3:
                     return provider
     
-    shipper_match = re.search(r'SHIPPER:\s*(.+?)(?:ORIGEN|PORT|$)', text, re.IGNORECASE)
+    shipper_match = _RE_SHIPPER.search(text_lc)
     if shipper_match:
-        return shipper_match.group(1).strip()
+        return _original_group(shipper_match, text, 1).strip()
     
-    provider_match = re.search(r'(Fabricante|Proveedor):\s*(.+)', text, re.IGNORECASE)
+    provider_match = _RE_PROVIDER.search(text_lc)
     if provider_match:
-        return provider_match.group(2).strip()
+        return _original_group(provider_match, text, 2).strip()
     
     return None
 
-def _extract_client_nit(text: str, lines: List[str]) -> Optional[str]:
-    nit_patterns = [
-        r'NIT[.\s]*[:\-]?\s*([\d\-.]+)',
-        r'Tax\s*Id:\s*([0-9\-]+)',
-        r'Nit:\s*([\d\-.]+)'
-    ]
-    
-    for pattern in nit_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+def _extract_client_nit(text_lc: str) -> Optional[str]:
+    for pattern in _NIT_PATTERNS:
+        match = pattern.search(text_lc)
         if match:
             return match.group(1).strip()
     
     return None
 
-def _extract_address(text: str, lines: List[str]) -> Optional[str]:
-    addr_patterns = [
-        r'(CR|CALLE|CARRERA|AV|AVENIDA)\s+[\d\s\-]+(?:\s+\d+)?',
-        r'Direccion:\s*(.+)',
-        r'Address:\s*(.+)'
-    ]
-    
-    for pattern in addr_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
+def _extract_address(text: str, lines: List[str], text_lc: str, lines_lc: List[str]) -> Optional[str]:
+    match = _RE_ADDR_STREET.search(text_lc)
+    if match:
+        return _original_group(match, text).strip()[:100]
+    
+    for pattern in _ADDR_LABEL_PATTERNS:
+        match = pattern.search(text_lc)
         if match:
-            addr = match.group(0) if pattern.startswith('(CR') else match.group(1)
-            return addr.strip()[:100]
+            return _original_group(match, text, 1).strip()[:100]
     
-    for i, line in enumerate(lines[:10]):
-        if re.search(r'Seller:', line, re.IGNORECASE):
+    for i, line_lc in enumerate(lines_lc[:10]):
+        if 'seller:' in line_lc:
             if i + 2 < len(lines):
                 addr = lines[i + 2].strip()
                 if re.search(r'\d+', addr):
@@ -315,19 +371,13 @@ def _extract_address(text: str, lines: List[str]) -> Optional[str]:
     
     return None
 
-def _extract_net_worth(text: str, lines: List[str]) -> Optional[float]:
-    summary = '\n'.join(lines[-15:])
-    
-    subtotal_patterns = [
-        r'Sub-total[:\s]+USD?\s*([\d,]+\.?\d*)',
-        r'Subtotal[:\s]+\$?\s*([\d,]+\.?\d*)',
-        r'Net\s*worth[:\s]+([\d,]+\.?\d*)'
-    ]
+def _extract_net_worth(lines_lc: List[str]) -> Optional[float]:
+    summary = '\n'.join(lines_lc[-15:])
     
-    for pattern in subtotal_patterns:
-        match = re.search(pattern, summary, re.IGNORECASE)
+    for pattern in _SUBTOTAL_PATTERNS:
+        match = pattern.search(summary)
         if match:
-            value_str = match.group(1).replace(',', '').replace(' ', '')
+            value_str = match.group(1).replace(',', '')
             try:
                 return float(value_str)
             except:
@@ -335,34 +385,29 @@ def _extract_net_worth(text: str, lines: List[str]) -> Optional[float]:
     
     return None
 
-def _extract_vat(text: str, lines: List[str]) -> Optional[float]:
-    for i, line in enumerate(lines):
-        if re.search(r'^IVA\s+USD\s+([\d,]+\.?\d*)$', line.strip(), re.IGNORECASE):
+def _extract_vat(lines: List[str], lines_lc: List[str]) -> Optional[float]:
+    for line, line_lc in zip(lines, lines_lc):
+        if _RE_IVA_LINE.search(line_lc.strip()):
             match = re.search(r'([\d,]+\.?\d*)$', line)
             if match:
-                value_str = match.group(1).replace(',', '').replace(' ', '')
+                value_str = match.group(1).replace(',', '')
                 try:
                     return float(value_str)
                 except:
                     pass
     
     summary_lines = []
-    for line in lines:
+    for line, line_lc in zip(lines, lines_lc):
         if 'Tasa:' in line or 'CUFE:' in line:
             break
-        summary_lines.append(line)
+        summary_lines.append(line_lc)
     
     summary = '\n'.join(summary_lines[-15:])
     
-    vat_patterns = [
-        r'IVA\s+USD\s*([\d,]+\.?\d*)',
-        r'VAT[:\s]+\$?\s*([\d,]+\.?\d*)',
-    ]
-    
-    for pattern in vat_patterns:
-        match = re.search(pattern, summary, re.IGNORECASE)
+    for pattern in _VAT_PATTERNS:
+        match = pattern.search(summary)
         if match:
-            value_str = match.group(1).replace(',', '').replace(' ', '')
+            value_str = match.group(1).replace(',', '')
             try:
                 return float(value_str)
             except:
@@ -370,19 +415,13 @@ def _extract_vat(text: str, lines: List[str]) -> Optional[float]:
     
     return None
 
-def _extract_gross_worth(text: str, lines: List[str]) -> Optional[float]:
-    summary = '\n'.join(lines[-10:])
-    
-    total_patterns = [
-        r'Total\s+USD\s*([\d,]+\.?\d*)',
-        r'Total[:\s]+\$?\s*([\d,]+\.?\d*)',
-        r'Gross\s*worth[:\s]+([\d,]+\.?\d*)'
-    ]
+def _extract_gross_worth(lines_lc: List[str]) -> Optional[float]:
+    summary = '\n'.join(lines_lc[-10:])
     
-    for pattern in total_patterns:
-        match = re.search(pattern, summary, re.IGNORECASE)
+    for pattern in _TOTAL_PATTERNS:
+        match = pattern.search(summary)
         if match:
-            value_str = match.group(1).replace(',', '').replace(' ', '')
+            value_str = match.group(1).replace(',', '')
             try:
                 return float(value_str)
             except:
@@ -390,29 +429,29 @@ def _extract_gross_worth(text: str, lines: List[str]) -> Optional[float]:
     
     return None
 
-def _extract_currency(text: str) -> str:
-    if re.search(r'\bUSD\b', text, re.IGNORECASE):
+def _extract_currency(text_lc: str) -> str:
+    if _RE_USD.search(text_lc):
         return "USD"
-    elif re.search(r'\bCOP\b', text, re.IGNORECASE):
+    elif _RE_COP.search(text_lc):
         return "COP"
-    elif '€' in text or re.search(r'\bEUR\b', text, re.IGNORECASE):
+    elif '€' in text_lc or _RE_EUR.search(text_lc):
         return "EUR"
-    elif '$' in text:
+    elif '$' in text_lc:
         return "USD"
     
     return "USD"
 
-def _extract_items_from_table(text: str, lines: List[str]) -> List[Dict[str, Any]]:
+def _extract_items_from_table(text: str, lines: List[str], lines_lc: List[str]) -> List[Dict[str, Any]]:
     items = []
     
     items_start = -1
     items_end = -1
     
-    for i, line in enumerate(lines):
-        if re.search(r'Codigo\s+Descipcion|Descripcion|Description', line, re.IGNORECASE):
+    for i, line_lc in enumerate(lines_lc):
+        if _RE_ITEMS_START.search(line_lc):
             items_start = i + 1
         # No cortamos temprano, procesamos hasta cerca del final
-        if re.search(r'PRACTICAR|RESOLUCION|Fecha Limite|CUFE|Tasa:', line, re.IGNORECASE) and items_start > 0:
+        if _RE_ITEMS_END.search(line_lc) and items_start > 0:
             items_end = i
             break
     
@@ -1,10 +1,11 @@
 import os
-import json
 import argparse
+from collections import Counter
+import orjson
 from tqdm import tqdm
 
 # Importar módulos del proyecto
-from preprocess import preprocess_image
+from preprocess import preprocess_image, needs_preprocess
 from ocr_layout import ocr_process_file
 from extractor import extract_semantic_data
 
@@ -14,6 +15,61 @@ from extractor import extract_semantic_data
 from rag import get_knowledge_base, RAGValidator
 from reporter import generate_report
 
+# orjson escribe UTF-8 directamente (equivalente a ensure_ascii=False)
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def _iter_results(results_path, status_counts=None):
+    """
+    Lee results.jsonl línea a línea sin cargar todos los resultados en memoria.
+    Si se pasa status_counts, acumula el conteo por validation_status.
+    """
+    with open(results_path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                result = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Línea incompleta de una ejecución interrumpida
+                continue
+            if status_counts is not None:
+                status_counts[result['data'].get('validation_status')] += 1
+            yield result
+
+
+def _truncate_partial_line(results_path):
+    """
+    Recorta results.jsonl hasta el último salto de línea.
+    Una ejecución interrumpida puede dejar un registro a medias; si no se
+    elimina, el siguiente registro quedaría pegado a él y se perderían ambos.
+    """
+    if not os.path.exists(results_path):
+        return
+    with open(results_path, 'r+b') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(65536, pos)
+            pos -= step
+            f.seek(pos)
+            nl = f.read(step).rfind(b'\n')
+            if nl != -1:
+                keep = pos + nl + 1
+                break
+        else:
+            keep = 0
+        if keep != end:
+            f.truncate(keep)
+
+
+def _load_processed_files(results_path):
+    """Retorna los nombres de archivo ya registrados en results.jsonl."""
+    if not os.path.exists(results_path):
+        return set()
+    return {result['source_file'] for result in _iter_results(results_path)}
+
+
 def main(args):
     """
     Función principal que orquesta el pipeline de extracción de datos de facturas.
@@ -73,7 +129,12 @@ def main(args):
     print("📄 PROCESANDO FACTURAS")
     print("=" * 70)
     
-    all_results = []
+    # Los resultados se agregan a un JSONL en vez de acumularse en memoria
+    results_path = os.path.join(output_dir, 'results.jsonl')
+    processed_files = _load_processed_files(results_path) if args.resume else set()
+    
+    if processed_files:
+        print(f"♻️  Reanudando: {len(processed_files)} facturas ya procesadas en {results_path}")
     
     # Buscar archivos de facturas
     factura_files = [
@@ -88,146 +149,165 @@ def main(args):
     
     print(f"📊 Total de facturas encontradas: {len(factura_files)}\n")
     
-    for idx, filename in enumerate(tqdm(factura_files, desc="Procesando"), 1):
-        file_path = os.path.join(facturas_dir, filename)
-        
-        print(f"\n{'─' * 70}")
-        print(f"[{idx}/{len(factura_files)}] 📄 {filename}")
-        print(f"{'─' * 70}")
-        
-        try:
-            # a) Preprocesamiento
-            processed_input = file_path
-            if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-                print("  🖼️  Preprocesando imagen...")
-                try:
-                    processed_input = preprocess_image(file_path)
-                    print("  ✅ Preprocesamiento completado")
-                except Exception as e:
-                    print(f"  ⚠️  Error en preprocesamiento: {e}")
-                    print("  ℹ️  Usando imagen original")
-                    processed_input = file_path
+    if args.resume:
+        _truncate_partial_line(results_path)
+    
+    with open(results_path, 'ab' if args.resume else 'wb') as results_fp:
+        for idx, filename in enumerate(tqdm(factura_files, desc="Procesando"), 1):
+            file_path = os.path.join(facturas_dir, filename)
             
-            # b) OCR
-            print("  📝 Extrayendo texto con OCR...")
-            ocr_output = ocr_process_file(processed_input)
+            print(f"\n{'─' * 70}")
+            print(f"[{idx}/{len(factura_files)}] 📄 {filename}")
+            print(f"{'─' * 70}")
             
-            if not ocr_output or not ocr_output.get("text", "").strip():
-                print("  ❌ No se pudo extraer texto. Saltando archivo.")
+            if filename in processed_files:
+                print("  ⏭️  Ya procesada en una ejecución anterior")
                 continue
             
-            ocr_text = ocr_output.get("text", "")
-            print(f"  ✅ Texto extraído: {len(ocr_text)} caracteres")
-            
-            # c) Extracción semántica
-            print("  🔍 Extrayendo campos clave...")
+            try:
+                # a) Preprocesamiento
+                processed_input = file_path
+                if filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                    if needs_preprocess(file_path):
+                        print("  🖼️  Preprocesando imagen...")
+                        try:
+                            processed_input = preprocess_image(file_path)
+                            print("  ✅ Preprocesamiento completado")
+                        except Exception as e:
+                            print(f"  ⚠️  Error en preprocesamiento: {e}")
+                            print("  ℹ️  Usando imagen original")
+                            processed_input = file_path
+                    else:
+                        print("  ℹ️  Imagen nítida y contrastada, se omite el preprocesamiento")
+                
+                # b) OCR
+                print("  📝 Extrayendo texto con OCR...")
+                ocr_output = ocr_process_file(processed_input)
+                
+                if not ocr_output or not ocr_output.get("text", "").strip():
+                    print("  ❌ No se pudo extraer texto. Saltando archivo.")
+                    continue
+                
+                ocr_text = ocr_output.get("text", "")
+                print(f"  ✅ Texto extraído: {len(ocr_text)} caracteres")
+                
+                # c) Extracción semántica
+                print("  🔍 Extrayendo campos clave...")
 
-            # ======================================================
-            #   ✅ AJUSTE QUE FALTABA (ENVÍA TEXTO COMPLETO AL EXTRACTOR)
-            # ======================================================
-            extracted_data = extract_semantic_data({
-                "text": ocr_text,
-                "file_path": file_path
-            })
-            # ======================================================
+                # ======================================================
+                #   ✅ AJUSTE QUE FALTABA (ENVÍA TEXTO COMPLETO AL EXTRACTOR)
+                # ======================================================
+                extracted_data = extract_semantic_data({
+                    "text": ocr_text,
+                    "file_path": file_path
+                })
+                # ======================================================
 
-            if not isinstance(extracted_data, dict):
-                extracted_data = {}
-            
-            # Campos mínimos
-            extracted_data.setdefault("numero_factura", None)
-            extracted_data.setdefault("fecha_emision", None)
-            extracted_data.setdefault("proveedor", None)
-            extracted_data.setdefault("nit_proveedor", None)
-            extracted_data.setdefault("direccion_proveedor", None)
-            extracted_data.setdefault("subtotal", None)
-            extracted_data.setdefault("impuestos", None)
-            extracted_data.setdefault("total", None)
-            extracted_data.setdefault("moneda", "COP")
-            extracted_data.setdefault("items", [])
-            
-            print("  ✅ Campos extraídos")
-            
-            # d) Validación RAG local
-            final_data = extracted_data
-            
-            if validator:
-                print("  🔎 Validando con base de conocimiento...")
-                try:
-                    final_data = validator.validate(extracted_data, ocr_text)
+                if not isinstance(extracted_data, dict):
+                    extracted_data = {}
+                
+                # Campos mínimos
+                extracted_data.setdefault("numero_factura", None)
+                extracted_data.setdefault("fecha_emision", None)
+                extracted_data.setdefault("proveedor", None)
+                extracted_data.setdefault("nit_proveedor", None)
+                extracted_data.setdefault("direccion_proveedor", None)
+                extracted_data.setdefault("subtotal", None)
+                extracted_data.setdefault("impuestos", None)
+                extracted_data.setdefault("total", None)
+                extracted_data.setdefault("moneda", "COP")
+                extracted_data.setdefault("items", [])
+                
+                print("  ✅ Campos extraídos")
+                
+                # d) Validación RAG local
+                final_data = extracted_data
+                
+                if validator:
+                    print("  🔎 Validando con base de conocimiento...")
+                    try:
+                        final_data = validator.validate(extracted_data, ocr_text)
 
-                    # ✅ AJUSTE AÑADIDO (EVITA ERROR GEMINI_API_KEY)
-                    final_data["llm_used"] = "none"
-                    final_data["llm_status"] = "disabled"
+                        # ✅ AJUSTE AÑADIDO (EVITA ERROR GEMINI_API_KEY)
+                        final_data["llm_used"] = "none"
+                        final_data["llm_status"] = "disabled"
 
-                    status = final_data.get("validation_status", "DESCONOCIDO")
-                    validations = final_data.get("validations", {})
-                    
-                    status_emoji = {
-                        "APROBADO": "✅",
-                        "ADVERTENCIA": "⚠️",
-                        "FALLIDO": "❌"
-                    }.get(status, "ℹ️")
+                        status = final_data.get("validation_status", "DESCONOCIDO")
+                        validations = final_data.get("validations", {})
+                        
+                        status_emoji = {
+                            "APROBADO": "✅",
+                            "ADVERTENCIA": "⚠️",
+                            "FALLIDO": "❌"
+                        }.get(status, "ℹ️")
+                        
+                        print(f"  {status_emoji} Estado: {status}")
+                        
+                        if validations:
+                            for field, val_info in validations.items():
+                                field_status = val_info.get("status", "N/A")
+                                emoji = {
+                                    "APROBADO": "✓",
+                                    "ADVERTENCIA": "!",
+                                    "FALLIDO": "✗"
+                                }.get(field_status, "?")
+                                print(f"     {emoji} {field}: {field_status}")
                     
-                    print(f"  {status_emoji} Estado: {status}")
-                    
-                    if validations:
-                        for field, val_info in validations.items():
-                            field_status = val_info.get("status", "N/A")
-                            emoji = {
-                                "APROBADO": "✓",
-                                "ADVERTENCIA": "!",
-                                "FALLIDO": "✗"
-                            }.get(field_status, "?")
-                            print(f"     {emoji} {field}: {field_status}")
-                
-                except Exception as e:
-                    print(f"  ⚠️  Error en validación: {e}")
-                    final_data = extracted_data
+                    except Exception as e:
+                        print(f"  ⚠️  Error en validación: {e}")
+                        final_data = extracted_data
+                        final_data["validations"] = {}
+                        final_data["validation_status"] = "ERROR"
+
+                        # ✅ AJUSTE AÑADIDO
+                        final_data["llm_used"] = "none"
+                        final_data["llm_status"] = "disabled"
+
+                else:
+                    print("  ℹ️  Saltando validación (RAG no disponible)")
                     final_data["validations"] = {}
-                    final_data["validation_status"] = "ERROR"
+                    final_data["validation_status"] = "NO_VALIDADO"
 
                     # ✅ AJUSTE AÑADIDO
                     final_data["llm_used"] = "none"
                     final_data["llm_status"] = "disabled"
-
-            else:
-                print("  ℹ️  Saltando validación (RAG no disponible)")
-                final_data["validations"] = {}
-                final_data["validation_status"] = "NO_VALIDADO"
-
-                # ✅ AJUSTE AÑADIDO
-                final_data["llm_used"] = "none"
-                final_data["llm_status"] = "disabled"
-            
-            # Guardar JSON
-            json_filename = f"{os.path.splitext(filename)[0]}.json"
-            json_path = os.path.join(json_output_dir, json_filename)
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(final_data, f, ensure_ascii=False, indent=2, default=str)
-            
-            print(f"  💾 JSON guardado: {json_filename}")
+                
+                # Guardar JSON
+                json_filename = f"{os.path.splitext(filename)[0]}.json"
+                json_path = os.path.join(json_output_dir, json_filename)
+                
+                with open(json_path, 'wb') as f:
+                    f.write(orjson.dumps(final_data, option=JSON_OPTIONS, default=str))
+                
+                print(f"  💾 JSON guardado: {json_filename}")
+                
+                results_fp.write(orjson.dumps(
+                    {
+                        "source_file": filename,
+                        "data": final_data,
+                        "thumbnail_path": None
+                    },
+                    option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE,
+                    default=str
+                ))
+                processed_files.add(filename)
             
-            all_results.append({
-                "source_file": filename,
-                "data": final_data,
-                "thumbnail_path": None
-            })
-        
-        except Exception as e:
-            print(f"  ❌ Error procesando {filename}: {e}")
-            import traceback
-            print(f"  📋 Traceback: {traceback.format_exc()}")
-            continue
+            except Exception as e:
+                print(f"  ❌ Error procesando {filename}: {e}")
+                import traceback
+                print(f"  📋 Traceback: {traceback.format_exc()}")
+                continue
     
     # --- 4. Generar reporte ---
-    if all_results:
+    if processed_files:
         print("\n" + "=" * 70)
         print("📊 GENERANDO REPORTE CONSOLIDADO")
         print("=" * 70)
         
         try:
+            status_counts = Counter()
+            results = _iter_results(results_path, status_counts)
+            
             report_path = os.path.join(report_output_dir, 'reporte_final.html')
             template_path = os.path.join(base_dir, 'templates', 'report_template.html')
             
@@ -235,12 +315,17 @@ def main(args):
                 print(f"⚠️  Template no encontrado: {template_path}")
                 print("   Creando reporte en formato JSON...")
                 report_path = os.path.join(report_output_dir, 'reporte_final.json')
-                with open(report_path, 'w', encoding='utf-8') as f:
-                    json.dump(all_results, f, ensure_ascii=False, indent=2, default=str)
+                with open(report_path, 'wb') as f:
+                    f.write(b'[')
+                    for i, result in enumerate(results):
+                        if i:
+                            f.write(b',\n')
+                        f.write(orjson.dumps(result, option=JSON_OPTIONS, default=str))
+                    f.write(b']')
             else:
                 from datetime import datetime
                 generate_report(
-                    results=all_results,
+                    results=results,
                     template_path=template_path,
                     output_path=report_path,
                     generation_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -249,16 +334,12 @@ def main(args):
             print(f"✅ Reporte generado: {report_path}")
             
             print("\n📈 RESUMEN:")
-            print(f"   • Total procesadas: {len(all_results)}")
+            print(f"   • Total procesadas: {sum(status_counts.values())}")
             
             if args.use_rag:
-                aprobadas = sum(1 for r in all_results if r['data'].get('validation_status') == 'APROBADO')
-                advertencias = sum(1 for r in all_results if r['data'].get('validation_status') == 'ADVERTENCIA')
-                fallidas = sum(1 for r in all_results if r['data'].get('validation_status') == 'FALLIDO')
-                
-                print(f"   • ✅ Aprobadas: {aprobadas}")
-                print(f"   • ⚠️  Con advertencias: {advertencias}")
-                print(f"   • ❌ Fallidas: {fallidas}")
+                print(f"   • ✅ Aprobadas: {status_counts['APROBADO']}")
+                print(f"   • ⚠️  Con advertencias: {status_counts['ADVERTENCIA']}")
+                print(f"   • ❌ Fallidas: {status_counts['FALLIDO']}")
         
         except Exception as e:
             print(f"❌ Error generando reporte: {e}")
@@ -282,6 +363,7 @@ Ejemplos de uso:
   python main.py --facturas_dir ./mis_facturas
   python main.py --no-rag
   python main.py --facturas_dir ./data/facturas --output_dir ./resultados
+  python main.py --resume
         """
     )
     
@@ -307,6 +389,12 @@ Ejemplos de uso:
         help='Deshabilitar validación con RAG'
     )
     
+    parser.add_argument(
+        '--resume', 
+        action='store_true', 
+        help='Reanudar una ejecución interrumpida omitiendo las facturas ya registradas en output/results.jsonl'
+    )
+    
     parser.set_defaults(use_rag=True)
     
     args = parser.parse_args()
@@ -1 +1,15 @@
-from .extraction import ocr_process_file
\ No newline at end of file
+import os
+import sys
+
+import pytesseract
+
+# ============================
+# AJUSTE NECESARIO PARA WINDOWS
+# ============================
+# Ruta por defecto del ejecutable de Tesseract; en Linux/macOS se usa el del PATH
+WINDOWS_TESSERACT_CMD = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+if sys.platform == 'win32' and os.path.exists(WINDOWS_TESSERACT_CMD):
+    pytesseract.pytesseract.tesseract_cmd = WINDOWS_TESSERACT_CMD
+
+from .extraction import ocr_process_file
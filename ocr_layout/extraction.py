@@ -2,17 +2,17 @@
 Módulo de extracción OCR mejorado
 Usa multipass para obtener el mejor resultado
 """
+import os
+import tempfile
 from pathlib import Path
 from PIL import Image
 import pytesseract
 import cv2
 import numpy as np
 
-# ============================
-# AJUSTE NECESARIO PARA WINDOWS
-# ============================
-# Ruta del ejecutable de Tesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Palabras clave de facturas (ya en minúsculas)
+_KEYWORDS = ('factura', 'total', 'subtotal', 'iva', 'nit', 'fecha',
+             'cliente', 'producto', 'cantidad', 'precio', 'valor')
 
 
 def extract_text_from_image(image_path: str, use_multipass: bool = True) -> str:
@@ -58,22 +58,30 @@ def _extract_with_multipass(img: Image) -> str:
     
     results = []
     
-    for config, name in configs:
-        try:
-            text = pytesseract.image_to_string(img, lang='spa+eng', config=config)
-            
-            # Calcular score de calidad
-            score = _calculate_text_quality(text)
-            
-            results.append({
-                'text': text,
-                'score': score,
-                'config': name,
-                'length': len(text)
-            })
-            
-        except Exception as e:
-            print(f"   ⚠️  Config {name} falló: {e}")
+    # Guardar la imagen una sola vez: si recibe un objeto PIL, pytesseract la
+    # vuelve a codificar en un archivo temporal en cada llamada; con una ruta
+    # Tesseract lee el archivo directamente.
+    tmp_path = _save_for_tesseract(img)
+    
+    try:
+        for config, name in configs:
+            try:
+                text = pytesseract.image_to_string(tmp_path, lang='spa+eng', config=config)
+                
+                # Calcular score de calidad
+                score = _calculate_text_quality(text)
+                
+                results.append({
+                    'text': text,
+                    'score': score,
+                    'config': name,
+                    'length': len(text)
+                })
+                
+            except Exception as e:
+                print(f"   ⚠️  Config {name} falló: {e}")
+    finally:
+        os.remove(tmp_path)
     
     if not results:
         return ""
@@ -86,6 +94,32 @@ def _extract_with_multipass(img: Image) -> str:
     return best['text']
 
 
+def _save_for_tesseract(img: Image) -> str:
+    """
+    Guarda la imagen en un PNG temporal y retorna su ruta.
+    Igual que pytesseract, reemplaza el canal alfa por fondo blanco.
+    """
+    if 'A' in img.getbands():
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        background.paste(img, (0, 0), img.getchannel('A'))
+        img = background
+    elif img.mode == 'CMYK':
+        img = img.convert('RGB')
+    
+    # delete=False: en Windows no se puede reabrir un NamedTemporaryFile abierto.
+    # Si el guardado falla, el archivo se borra aquí: el llamador solo recibe
+    # la ruta (y se encarga de borrarla) cuando el PNG quedó escrito
+    tmp = tempfile.NamedTemporaryFile(prefix='ocr_', suffix='.png', delete=False)
+    try:
+        with tmp:
+            img.save(tmp, format='PNG')
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+    
+    return tmp.name
+
+
 def _calculate_text_quality(text: str) -> float:
     """
     Calcula un score de calidad del texto OCR
@@ -109,9 +143,8 @@ def _calculate_text_quality(text: str) -> float:
     word_ratio = valid_words / max(len(words), 1)
     
     # Detectar palabras clave de facturas
-    keywords = ['factura', 'total', 'subtotal', 'iva', 'nit', 'fecha', 
-                'cliente', 'producto', 'cantidad', 'precio', 'valor']
-    keyword_count = sum(1 for kw in keywords if kw.lower() in text.lower())
+    text_lower = text.lower()
+    keyword_count = sum(1 for kw in _KEYWORDS if kw in text_lower)
     keyword_bonus = min(keyword_count * 0.1, 0.5)
     
     # Penalizar exceso de caracteres especiales consecutivos
@@ -195,105 +228,3 @@ if __name__ == "__main__":
     print(f"\n📝 TEXTO:")
     print("="*70)
     print(result['text'][:500])
-
-
-
-# ===========================================================
-# === AQUI AGREGO EL EXTRACTOR SEMÁNTICO COMPLETO (NUEVO) ===
-# ===========================================================
-
-import re
-
-def extract_semantic_data(ocr_output):
-    """
-    Extrae información clave desde texto OCR.
-    Compatible con formatos de facturas: imagen, PDF, escaneadas, fotos.
-    NO modifica NADA del OCR, solo interpreta el texto.
-    """
-
-    text = ocr_output if isinstance(ocr_output, str) else ocr_output.get("text", "")
-    clean = text.replace("\n", " ").replace("  ", " ")
-
-    data = {}
-
-    # -------------------------
-    # CAMPOS PRINCIPALES
-    # -------------------------
-
-    factura = re.search(r"(factura|invoice|bill)[^\d]*(\d+)", clean, re.I)
-    data["numero_factura"] = factura.group(2) if factura else None
-
-    fechas = re.findall(r"(20\d{2}[\/\-.]\d{1,2}[\/\-.]\d{1,2})", clean)
-    data["fecha_emision"] = fechas[0] if fechas else None
-
-    proveedor = re.search(r"(fabricante|proveedor|empresa|shipper)[: ]+(.{5,40})", clean, re.I)
-    data["proveedor"] = proveedor.group(2).strip() if proveedor else None
-
-    nit = re.search(r"NIT[:.\- ]+(\d[\d\-.]+)", clean, re.I)
-    data["nit_proveedor"] = nit.group(1) if nit else None
-
-    direccion = re.search(r"(dir|dirección|address)[: ]+(.{5,50})", clean, re.I)
-    data["direccion_proveedor"] = direccion.group(2).strip() if direccion else None
-
-    sub = re.search(r"Sub[- ]?total[: ]+\$?([\d,.]+)", clean, re.I)
-    data["subtotal"] = sub.group(1) if sub else None
-
-    iva = re.search(r"IVA[: ]+\$?([\d,.]+)", clean, re.I)
-    data["impuestos"] = iva.group(1) if iva else None
-
-    total = re.search(r"Total[: ]+\$?([\d,.]+)", clean, re.I)
-    data["total"] = total.group(1) if total else None
-
-    total_usd = re.search(r"Total USD[: ]+([\d,.]+)", clean, re.I)
-    data["total_usd"] = total_usd.group(1) if total_usd else None
-
-    trm = re.search(r"Tasa[: ]+\$?([\d,.]+)", clean, re.I)
-    data["tasa_cambio"] = trm.group(1) if trm else None
-
-    # Moneda
-    data["moneda"] = "USD" if "USD" in clean else "COP"
-
-    # -------------------------
-    # ITEMS / DETALLES
-    # -------------------------
-
-    items = []
-    lineas = text.split("\n")
-
-    for linea in lineas:
-        if any(tag in linea.upper() for tag in ["USD", "$", "INGRESOS", "GATE", "CLEANING", "SUB-", "SUBTOTAL"]):
-            items.append(linea.strip())
-
-    if len(items) < 2:
-        items = lineas
-
-    data["items"] = items
-
-    # -------------------------
-    # EXTRACCIÓN ESPECIAL
-    # -------------------------
-
-    shipper = re.search(r"SHIPPER[: ]+(.+?)CONSIGNEE", clean, re.I)
-    data["shipper"] = shipper.group(1).strip() if shipper else None
-
-    consignee = re.search(r"CONSIGNEE[: ]+(.+?)DESTINO", clean, re.I)
-    data["consignee"] = consignee.group(1).strip() if consignee else None
-
-    peso = re.search(r"PESO[: ]+([\d,.]+)", clean, re.I)
-    data["peso"] = peso.group(1) if peso else None
-
-    volumen = re.search(r"VOLUMEN[: ]+([\d,.]+)", clean, re.I)
-    data["volumen"] = volumen.group(1) if volumen else None
-
-    hbl = re.search(r"HBL[_\- ]?HAWB[: ]+([A-Z0-9]+)", clean, re.I)
-    mbl = re.search(r"MBL[_\- ]?MAWB[: ]+([A-Z0-9]+)", clean, re.I)
-    data["hbl"] = hbl.group(1) if hbl else None
-    data["mbl"] = mbl.group(1) if mbl else None
-
-    ica = re.search(r"ICA[: ]+([\d.,]+)", clean, re.I)
-    data["ica"] = ica.group(1) if ica else None
-
-    ret = re.search(r"RETENCION.*?(\d+%|\d\.\d+%)", clean, re.I)
-    data["retencion_fuente"] = ret.group(1) if ret else None
-
-    return data
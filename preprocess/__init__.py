@@ -6,6 +6,7 @@ Compatible con código existente
 from .image_processing import (
     ImagePreprocessor,
     preprocess_image,  # Función de compatibilidad
+    needs_preprocess,
     extract_text_with_multipass,
     extract_text_from_image
 )
@@ -13,6 +14,7 @@ from .image_processing import (
 __all__ = [
     'ImagePreprocessor',
     'preprocess_image',
+    'needs_preprocess',
     'extract_text_with_multipass', 
     'extract_text_from_image'
 ]
\ No newline at end of file
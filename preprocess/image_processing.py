@@ -2,12 +2,164 @@
 Preprocesamiento mejorado de imágenes para OCR
 Múltiples estrategias para mejorar la calidad
 """
+import os
+import re
+import atexit
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import cv2
+import diskcache
 import numpy as np
 from pathlib import Path
-from PIL import Image
 import pytesseract
 
+MULTIPASS_STRATEGIES = ['aggressive', 'conservative', 'scan', 'photo']
+
+# Confianza a partir de la cual no vale la pena seguir probando configs/estrategias
+EARLY_EXIT_CONFIDENCE = 0.95
+
+# Kernel fijo de la estrategia agresiva (se crea una sola vez)
+_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (2,2))
+
+# Todo lo que no es alfanumérico (equivale a "not str.isalnum()" en Unicode)
+_RE_NON_ALNUM = re.compile(r'[\W_]+')
+
+
+def _cuda_available() -> bool:
+    """True si OpenCV fue compilado con CUDA y hay al menos una GPU"""
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount() > 0
+    except (AttributeError, cv2.error):
+        return False
+
+
+_CUDA_AVAILABLE = _cuda_available()
+
+# Caché en disco de preprocesamiento y OCR (compartida entre ejecuciones)
+# PREPROCESS_VERSION forma parte de la clave del preprocesamiento: subirla
+# cada vez que cambie algún filtro, umbral o el deskew para invalidar
+# las salidas generadas con el pipeline anterior
+PREPROCESS_VERSION = 2
+OCR_CACHE_DIR = os.path.join('temp', 'ocr_cache')
+_ocr_cache = None
+
+
+def _get_ocr_cache() -> diskcache.Cache:
+    """Abre la caché en disco la primera vez que se necesita"""
+    global _ocr_cache
+    if _ocr_cache is None:
+        _ocr_cache = diskcache.Cache(OCR_CACHE_DIR, eviction_policy='least-recently-used')
+    return _ocr_cache
+
+
+def _file_digest(path: str) -> str:
+    """Hash blake2b (128 bits) del contenido de un archivo, leído por bloques"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _default_workers() -> int:
+    """Un worker por estrategia, sin pasar del número de CPUs"""
+    return min(len(MULTIPASS_STRATEGIES), os.cpu_count() or 1)
+
+
+def _init_worker():
+    """
+    Inicializador de los procesos del pool
+    
+    OpenCV ya paraleliza internamente (fastNlMeansDenoising, etc.);
+    con varios procesos eso solo genera sobresuscripción de CPU.
+    """
+    cv2.setNumThreads(1)
+
+
+# Pool de procesos compartido entre imágenes: se crea la primera vez que se
+# necesita y se reutiliza, así cada factura no paga el arranque de los workers
+# (ni la importación de cv2/pytesseract/diskcache en plataformas con spawn)
+_strategy_pool = None
+_strategy_pool_workers = 0
+_strategy_pool_lock = threading.Lock()
+
+
+def _get_strategy_pool(workers: int) -> ProcessPoolExecutor:
+    """Retorna el pool compartido, recreándolo solo si se piden más workers"""
+    global _strategy_pool, _strategy_pool_workers
+    with _strategy_pool_lock:
+        if _strategy_pool is None or _strategy_pool_workers < workers:
+            if _strategy_pool is not None:
+                _strategy_pool.shutdown(wait=True)
+            _strategy_pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+            _strategy_pool_workers = workers
+        return _strategy_pool
+
+
+def _shutdown_strategy_pool(pool: ProcessPoolExecutor = None):
+    """Cierra el pool compartido (si se pasa pool, solo si sigue siendo el actual)"""
+    global _strategy_pool, _strategy_pool_workers
+    with _strategy_pool_lock:
+        if _strategy_pool is None or (pool is not None and pool is not _strategy_pool):
+            return
+        _strategy_pool.shutdown(wait=False, cancel_futures=True)
+        _strategy_pool = None
+        _strategy_pool_workers = 0
+
+
+atexit.register(_shutdown_strategy_pool)
+
+
+def _run_strategy(output_dir: str, img, strategy: str, image_name: str) -> str:
+    """
+    Ejecuta una estrategia en un proceso worker y guarda el resultado
+    
+    Returns:
+        Ruta de la imagen procesada
+    """
+    preprocessor = ImagePreprocessor(output_dir=output_dir)
+    processed = preprocessor._apply_strategy(img, strategy)
+    
+    output_path = preprocessor.output_dir / f"{strategy}_{image_name}"
+    cv2.imwrite(str(output_path), processed)
+    return str(output_path)
+
+
+def _denoise_upscale_clahe_cuda(gray, clip_limit: float, d: int = 5, nlmeans_h: float = None):
+    """
+    Denoise + upscale x3 + CLAHE en la GPU (misma secuencia que la versión CPU)
+    
+    La imagen se sube una vez y se descarga una vez; la versión x3
+    solo existe en memoria de la GPU hasta el final.
+    
+    Args:
+        gray: Imagen en escala de grises
+        clip_limit: clipLimit de CLAHE
+        d: Diámetro del filtro bilateral
+        nlmeans_h: Si se indica, usa NL-means con ese h en vez de bilateral
+    
+    Returns:
+        Imagen mejorada (numpy, uint8)
+    """
+    d_gray = cv2.cuda_GpuMat()
+    d_gray.upload(gray)
+    
+    if nlmeans_h is not None:
+        d_den = cv2.cuda.fastNlMeansDenoising(d_gray, nlmeans_h, search_window=21, block_size=7)
+    else:
+        d_den = cv2.cuda.bilateralFilter(d_gray, d, 50, 50)
+    
+    height, width = gray.shape
+    d_up = cv2.cuda.resize(d_den, (width*3, height*3), interpolation=cv2.INTER_CUBIC)
+    
+    clahe = cv2.cuda.createCLAHE(clipLimit=clip_limit, tileGridSize=(8,8))
+    d_enh = clahe.apply(d_up, cv2.cuda_Stream.Null())
+    
+    return d_enh.download()
+
+
 class ImagePreprocessor:
     def __init__(self, output_dir='temp'):
         self.output_dir = Path(output_dir)
@@ -19,7 +171,7 @@ class ImagePreprocessor:
         
         Args:
             image_path: Ruta de la imagen
-            strategy: 'auto', 'aggressive', 'conservative', 'scan', 'photo'
+            strategy: 'auto', 'aggressive', 'aggressive_hq', 'conservative', 'scan', 'photo'
         
         Returns:
             Ruta de la imagen procesada
@@ -38,6 +190,8 @@ class ImagePreprocessor:
         # Aplicar estrategia
         if strategy == 'aggressive':
             processed = self._aggressive_preprocessing(img)
+        elif strategy == 'aggressive_hq':
+            processed = self._aggressive_preprocessing(img, high_quality=True)
         elif strategy == 'conservative':
             processed = self._conservative_preprocessing(img)
         elif strategy == 'scan':
@@ -58,15 +212,14 @@ class ImagePreprocessor:
         """Detecta la mejor estrategia según características de la imagen"""
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        # Calcular brillo promedio
-        brightness = np.mean(gray)
-        
-        # Calcular contraste
-        contrast = gray.std()
+        # Brillo promedio y contraste en una sola pasada
+        mean, stddev = cv2.meanStdDev(gray)
+        brightness = mean[0, 0]
+        contrast = stddev[0, 0]
         
         # Detectar si es escaneo o foto
         edges = cv2.Canny(gray, 50, 150)
-        edge_density = np.sum(edges > 0) / edges.size
+        edge_density = cv2.countNonZero(edges) / edges.size
         
         print(f"   📊 Brillo: {brightness:.1f}, Contraste: {contrast:.1f}, Bordes: {edge_density:.3f}")
         
@@ -78,44 +231,65 @@ class ImagePreprocessor:
         else:
             return 'scan'  # Parece escaneo limpio
     
-    def _aggressive_preprocessing(self, img):
-        """Preprocesamiento agresivo para imágenes difíciles"""
-        print("   🔧 Aplicando preprocesamiento AGRESIVO...")
+    def _aggressive_preprocessing(self, img, high_quality=False):
+        """
+        Preprocesamiento agresivo para imágenes difíciles
+        
+        Args:
+            img: Imagen BGR
+            high_quality: Si True, usa NL-means (mucho más lento) en vez de bilateral
+        """
+        print("   🔧 Aplicando preprocesamiento AGRESIVO" + (" (HQ)..." if high_quality else "..."))
         
         # 1. Convertir a escala de grises
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
-        # 2. Upscale x3 (mejora OCR significativamente)
-        height, width = gray.shape
-        gray = cv2.resize(gray, (width*3, height*3), interpolation=cv2.INTER_CUBIC)
-        
-        # 3. Denoise agresivo
-        denoised = cv2.fastNlMeansDenoising(gray, None, h=20, templateWindowSize=7, searchWindowSize=21)
+        if _CUDA_AVAILABLE:
+            # Pasos 2-4 en la GPU
+            enhanced = _denoise_upscale_clahe_cuda(
+                gray, clip_limit=3.0, d=5, nlmeans_h=20 if high_quality else None
+            )
+        else:
+            # 2. Denoise agresivo (bilateral conserva bordes a una fracción del costo de NL-means)
+            # Se hace antes del upscale: 9x menos píxeles y no se amplifica el ruido
+            if high_quality:
+                denoised = cv2.fastNlMeansDenoising(gray, None, h=20, templateWindowSize=7, searchWindowSize=21)
+            else:
+                denoised = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
+            
+            # 3. Upscale x3 (mejora OCR significativamente)
+            height, width = denoised.shape
+            denoised = cv2.resize(denoised, (width*3, height*3), interpolation=cv2.INTER_CUBIC)
+            
+            # 4. Mejorar contraste con CLAHE
+            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            enhanced = clahe.apply(denoised)
         
-        # 4. Mejorar contraste con CLAHE
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
+        # Los pasos 5-7 trabajan in-place sobre el mismo buffer
+        # para no reservar una imagen 9x nueva en cada uno
         
-        # 5. Sharpening
-        kernel = np.array([[-1,-1,-1],
-                          [-1, 9,-1],
-                          [-1,-1,-1]])
-        sharpened = cv2.filter2D(enhanced, -1, kernel)
+        # 5. Sharpening con el kernel [[-1,-1,-1],[-1,9,-1],[-1,-1,-1]]
+        # Equivale a 10*pixel - suma3x3: la suma sale de un boxFilter separable
+        # (sin normalizar, en 16 bits) y el resultado es idéntico al de filter2D
+        box_sum = cv2.boxFilter(enhanced, cv2.CV_16S, (3,3), normalize=False)
+        cv2.addWeighted(enhanced, 10, box_sum, -1, 0, dst=enhanced, dtype=cv2.CV_8U)
         
         # 6. Binarización adaptativa
-        binary = cv2.adaptiveThreshold(
-            sharpened, 255, 
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+        # MEAN_C usa un box filter (costo independiente de blockSize); la
+        # ventana más grande compensa que la media sea menos selectiva
+        cv2.adaptiveThreshold(
+            enhanced, 255, 
+            cv2.ADAPTIVE_THRESH_MEAN_C, 
             cv2.THRESH_BINARY, 
-            blockSize=15, 
-            C=10
+            blockSize=25, 
+            C=10,
+            dst=enhanced
         )
         
         # 7. Morfología para limpiar ruido
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2,2))
-        cleaned = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+        cv2.morphologyEx(enhanced, cv2.MORPH_CLOSE, _CLOSE_KERNEL, dst=enhanced)
         
-        return cleaned
+        return enhanced
     
     def _conservative_preprocessing(self, img):
         """Preprocesamiento conservador para imágenes buenas"""
@@ -142,11 +316,24 @@ class ImagePreprocessor:
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
         
         # Deskew (corregir inclinación)
-        coords = np.column_stack(np.where(gray > 0))
-        angle = cv2.minAreaRect(coords)[-1]
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
+        # El ángulo se estima sobre los píxeles de texto de una copia a 1/4
+        # (Otsu invertido); la rotación se aplica a la imagen completa
+        small = cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+        _, bw = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        points = cv2.findNonZero(bw)
+        
+        angle = 0.0
+        if points is not None:
+            # findNonZero devuelve (x, y); se invierte a (y, x) como np.where
+            # para conservar la convención de ángulo de abajo
+            coords = np.ascontiguousarray(points[:, :, ::-1])
+            angle = cv2.minAreaRect(coords)[-1]
+            # OpenCV >= 4.5 devuelve el ángulo en (0, 90] (antes en [-90, 0));
+            # se normaliza a (-45, 45] antes de invertirlo para corregir
+            if angle > 45:
+                angle -= 90
+            elif angle < -45:
+                angle += 90
             angle = -angle
         
         if abs(angle) > 0.5:
@@ -175,120 +362,252 @@ class ImagePreprocessor:
         # Corrección de perspectiva (simplificada)
         # En producción, usar detección de contornos
         
-        # Upscale
-        height, width = gray.shape
-        gray = cv2.resize(gray, (width*3, height*3), interpolation=cv2.INTER_CUBIC)
-        
-        # Denoise fuerte
-        denoised = cv2.fastNlMeansDenoising(gray, None, h=15)
-        
-        # Mejorar contraste
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
+        if _CUDA_AVAILABLE:
+            # Denoise + upscale + contraste en la GPU
+            enhanced = _denoise_upscale_clahe_cuda(gray, clip_limit=2.0, d=7)
+        else:
+            # Denoise fuerte (bilateral en vez de NL-means), antes del upscale
+            denoised = cv2.bilateralFilter(gray, d=7, sigmaColor=50, sigmaSpace=50)
+            
+            # Upscale
+            height, width = denoised.shape
+            denoised = cv2.resize(denoised, (width*3, height*3), interpolation=cv2.INTER_CUBIC)
+            
+            # Mejorar contraste
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+            enhanced = clahe.apply(denoised)
         
-        # Binarización adaptativa
+        # Binarización adaptativa (media local, ver estrategia agresiva)
         binary = cv2.adaptiveThreshold(
             enhanced, 255,
-            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.ADAPTIVE_THRESH_MEAN_C,
             cv2.THRESH_BINARY,
-            blockSize=11,
+            blockSize=25,
             C=8
         )
         
         return binary
     
-    def preprocess_multipass(self, image_path: str) -> list:
+    def _apply_strategy(self, img, strategy: str):
+        """Aplica una estrategia de multipass a una imagen ya leída"""
+        if strategy == 'aggressive':
+            return self._aggressive_preprocessing(img)
+        elif strategy == 'aggressive_hq':
+            return self._aggressive_preprocessing(img, high_quality=True)
+        elif strategy == 'conservative':
+            return self._conservative_preprocessing(img)
+        elif strategy == 'scan':
+            return self._scan_preprocessing(img)
+        else:
+            return self._photo_preprocessing(img)
+    
+    def preprocess_multipass(self, image_path: str, max_workers: int = None) -> list:
         """
         Genera múltiples versiones procesadas
         Útil para probar cuál da mejor OCR
         
+        Las estrategias son independientes, así que se ejecutan en paralelo
+        en un pool de procesos (la imagen se lee una sola vez).
+        Si la misma imagen ya se procesó y sus salidas siguen intactas,
+        se devuelven directamente desde la caché.
+        
+        Args:
+            image_path: Ruta de la imagen
+            max_workers: Procesos a usar (default: uno por estrategia, máx. CPUs).
+                         Con 1 se ejecuta todo en el proceso actual.
+        
         Returns:
-            Lista de rutas de imágenes procesadas
+            Lista de rutas de imágenes procesadas (la estrategia detectada primero)
+        
+        Raises:
+            ValueError: Si la imagen no se puede leer
         """
-        strategies = ['aggressive', 'conservative', 'scan', 'photo']
+        cache = _get_ocr_cache()
+        backend = 'cuda' if _CUDA_AVAILABLE else 'cpu'
+        cache_key = (f"multipass:v{PREPROCESS_VERSION}:{backend}:"
+                     f"{_file_digest(image_path)}:{self.output_dir.resolve()}")
+        
+        # Las salidas se comparan por hash: otra imagen con el mismo nombre
+        # pudo haberlas sobrescrito
+        cached = cache.get(cache_key)
+        if cached and all(os.path.exists(path) and _file_digest(path) == digest
+                          for path, digest in cached):
+            print("   ♻️  Preprocesamiento recuperado de caché")
+            return [path for path, _ in cached]
+        
+        # Una sola lectura para todas las estrategias; ninguna modifica img in-place
+        img = cv2.imread(str(image_path))
+        if img is None:
+            raise ValueError(f"No se pudo leer la imagen: {image_path}")
+        
+        # La estrategia que elegiría 'auto' va primero: es la candidata más
+        # probable a superar EARLY_EXIT_CONFIDENCE en el OCR
+        detected = self._detect_best_strategy(img)
+        strategies = [detected] + [s for s in MULTIPASS_STRATEGIES if s != detected]
+        
+        processed_images = self._run_strategies(img, Path(image_path).name, strategies, max_workers)
+        
+        if processed_images:
+            cache.set(cache_key, [(path, _file_digest(path)) for path in processed_images])
+        
+        return processed_images
+    
+    def _run_strategies(self, img, image_name: str, strategies: list,
+                        max_workers: int = None) -> list:
+        """Ejecuta las estrategias de multipass (en paralelo si hay más de un worker)"""
+        workers = max_workers or _default_workers()
+        if _CUDA_AVAILABLE:
+            # El contexto CUDA ya se inicializó en este proceso y no sobrevive
+            # a un fork; además la GPU ya paraleliza cada estrategia
+            workers = 1
         processed_images = []
         
-        for strategy in strategies:
+        if workers <= 1:
+            for strategy in strategies:
+                try:
+                    processed_images.append(
+                        _run_strategy(str(self.output_dir), img, strategy, image_name)
+                    )
+                except Exception as e:
+                    print(f"   ⚠️  Error con estrategia {strategy}: {e}")
+            return processed_images
+        
+        executor = _get_strategy_pool(workers)
+        futures = [
+            (strategy, executor.submit(_run_strategy, str(self.output_dir),
+                                       img, strategy, image_name))
+            for strategy in strategies
+        ]
+        
+        # Se recorren en orden para que el resultado sea determinista
+        for strategy, future in futures:
             try:
-                img = cv2.imread(str(image_path))
-                if img is None:
-                    continue
-                
-                if strategy == 'aggressive':
-                    processed = self._aggressive_preprocessing(img)
-                elif strategy == 'conservative':
-                    processed = self._conservative_preprocessing(img)
-                elif strategy == 'scan':
-                    processed = self._scan_preprocessing(img)
-                else:
-                    processed = self._photo_preprocessing(img)
-                
-                output_path = self.output_dir / f"{strategy}_{Path(image_path).name}"
-                cv2.imwrite(str(output_path), processed)
-                processed_images.append(str(output_path))
-                
+                processed_images.append(future.result())
+            except BrokenProcessPool as e:
+                # Un worker murió: el pool ya no sirve, se crea otro en la próxima imagen
+                print(f"   ⚠️  Error con estrategia {strategy}: {e}")
+                _shutdown_strategy_pool(executor)
             except Exception as e:
                 print(f"   ⚠️  Error con estrategia {strategy}: {e}")
         
         return processed_images
 
 
-def extract_text_with_multipass(image_path: str) -> tuple:
+def _ocr_confidence(text: str) -> float:
+    """
+    "Confianza" del OCR: proporción de caracteres alfanuméricos
+    sin contar espacios ni saltos de línea
+    """
+    total_count = len(text) - text.count('\n') - text.count(' ')
+    if total_count <= 0:
+        return 0
+    
+    alpha_count = len(_RE_NON_ALNUM.sub('', text))
+    return alpha_count / total_count
+
+
+def _ocr_strategy(processed_path: str) -> dict:
+    """
+    Prueba las configuraciones de Tesseract sobre una imagen procesada
+    
+    Cada (imagen, config) se guarda en caché por el hash del archivo,
+    así que reprocesar la misma imagen no vuelve a llamar a Tesseract.
+    
+    Returns:
+        Diccionario con el mejor texto de esa estrategia
+    """
+    strategy = Path(processed_path).name.split('_')[0]
+    
+    # OCR con configuración optimizada
+    cache = _get_ocr_cache()
+    digest = _file_digest(processed_path)
+    
+    # PSM 6 = bloque uniforme de texto
+    # PSM 4 = columna única de texto
+    # PSM 3 = automático
+    configs = [
+        '--oem 3 --psm 6',  # Bloque uniforme
+        '--oem 3 --psm 4',  # Columna única
+        '--oem 3 --psm 3',  # Automático
+    ]
+    
+    best_text = ""
+    best_conf = 0
+    
+    for config in configs:
+        cache_key = f"ocr:{digest}:{config}"
+        cached = cache.get(cache_key)
+        
+        if cached is not None:
+            text, confidence = cached
+        else:
+            # Se pasa la ruta: Tesseract lee el PNG ya escrito. Con un objeto
+            # PIL, pytesseract lo volvería a codificar a un archivo temporal
+            text = pytesseract.image_to_string(processed_path, lang='spa+eng', config=config)
+            
+            # Calcular "confianza" basado en caracteres legibles
+            confidence = _ocr_confidence(text)
+            cache.set(cache_key, (text, confidence))
+        
+        if confidence > best_conf:
+            best_conf = confidence
+            best_text = text
+        
+        # Las demás configs no van a mejorar un resultado casi perfecto
+        if best_conf >= EARLY_EXIT_CONFIDENCE:
+            break
+    
+    return {
+        'strategy': strategy,
+        'text': best_text,
+        'length': len(best_text),
+        'confidence': best_conf,
+        'path': processed_path
+    }
+
+
+def extract_text_with_multipass(image_path: str, max_workers: int = None) -> tuple:
     """
     Extrae texto probando múltiples estrategias de preprocesamiento
     Retorna el mejor resultado
     
+    Las estrategias se revisan en orden de prioridad (la detectada primero);
+    si una supera EARLY_EXIT_CONFIDENCE se cancelan las que no han empezado.
+    
+    Args:
+        image_path: Ruta de la imagen
+        max_workers: Workers para preprocesamiento y OCR (default: uno por estrategia)
+    
     Returns:
         (best_text, best_strategy, all_results)
     """
+    workers = max_workers or _default_workers()
+    
     preprocessor = ImagePreprocessor()
-    processed_images = preprocessor.preprocess_multipass(image_path)
+    processed_images = preprocessor.preprocess_multipass(image_path, max_workers=workers)
     
     results = []
     
-    for processed_path in processed_images:
-        strategy = Path(processed_path).name.split('_')[0]
+    # Tesseract corre como subproceso, así que basta con hilos para el OCR
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(path, executor.submit(_ocr_strategy, path)) for path in processed_images]
         
-        try:
-            # OCR con configuración optimizada
-            img = Image.open(processed_path)
-            
-            # PSM 6 = bloque uniforme de texto
-            # PSM 4 = columna única de texto
-            # PSM 3 = automático
-            configs = [
-                '--oem 3 --psm 6',  # Bloque uniforme
-                '--oem 3 --psm 4',  # Columna única
-                '--oem 3 --psm 3',  # Automático
-            ]
+        for processed_path, future in futures:
+            strategy = Path(processed_path).name.split('_')[0]
             
-            best_text = ""
-            best_conf = 0
-            
-            for config in configs:
-                text = pytesseract.image_to_string(img, lang='spa+eng', config=config)
-                
-                # Calcular "confianza" basado en caracteres legibles
-                alpha_count = sum(c.isalnum() for c in text)
-                total_count = len(text.replace('\n', '').replace(' ', ''))
-                confidence = alpha_count / max(total_count, 1) if total_count > 0 else 0
+            try:
+                result = future.result()
+                results.append(result)
+                print(f"   {strategy}: {result['length']} chars, confianza: {result['confidence']:.2f}")
                 
-                if confidence > best_conf:
-                    best_conf = confidence
-                    best_text = text
-            
-            results.append({
-                'strategy': strategy,
-                'text': best_text,
-                'length': len(best_text),
-                'confidence': best_conf,
-                'path': processed_path
-            })
-            
-            print(f"   {strategy}: {len(best_text)} chars, confianza: {best_conf:.2f}")
+            except Exception as e:
+                print(f"   ❌ Error en {strategy}: {e}")
+                continue
             
-        except Exception as e:
-            print(f"   ❌ Error en {strategy}: {e}")
+            if result['confidence'] >= EARLY_EXIT_CONFIDENCE:
+                for _, pending in futures:
+                    pending.cancel()
+                break
     
     if not results:
         return "", "none", []
@@ -320,8 +639,38 @@ def extract_text_from_image(image_path: str, multipass: bool = True) -> str:
     else:
         preprocessor = ImagePreprocessor()
         processed = preprocessor.preprocess(image_path, strategy='auto')
-        img = Image.open(processed)
-        return pytesseract.image_to_string(img, lang='spa+eng', config='--oem 3 --psm 6')
+        return pytesseract.image_to_string(processed, lang='spa+eng', config='--oem 3 --psm 6')
+
+
+def needs_preprocess(image_path: str, blur_threshold: float = 100.0,
+                     contrast_threshold: float = 40.0) -> bool:
+    """
+    Sondeo rápido de calidad para decidir si vale la pena preprocesar
+    
+    Trabaja sobre una versión reducida (máx. 512 px de ancho) en escala de grises:
+    - Varianza del Laplaciano baja = imagen borrosa
+    - Desviación estándar baja = poco contraste
+    
+    Args:
+        image_path: Ruta de la imagen
+        blur_threshold: Varianza del Laplaciano mínima para considerarla nítida
+        contrast_threshold: Desviación estándar mínima para considerarla contrastada
+    
+    Returns:
+        True si la imagen necesita preprocesamiento
+    """
+    img = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        # Que el preprocesamiento reporte el error de lectura
+        return True
+    
+    scale = min(1.0, 512 / img.shape[1])
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    
+    lap_var = cv2.Laplacian(small, cv2.CV_64F).var()
+    contrast = small.std()
+    
+    return lap_var < blur_threshold or contrast < contrast_threshold
 
 
 # Función de compatibilidad con código anterior
@@ -342,18 +691,20 @@ def preprocess_image(image_path: str, output_dir: str = 'temp') -> str:
 
 
 if __name__ == "__main__":
-    import sys
+    import argparse
     
-    if len(sys.argv) < 2:
-        print("Uso: python image_processing.py <imagen>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Extracción de texto con multipass')
+    parser.add_argument('image', help='Ruta de la imagen')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Procesos para las estrategias (default: uno por estrategia, 1 = secuencial)')
+    args = parser.parse_args()
     
-    image_path = sys.argv[1]
+    image_path = args.image
     
     print("🔍 EXTRACCIÓN DE TEXTO CON MULTIPASS")
     print("="*70)
     
-    text, strategy, all_results = extract_text_with_multipass(image_path)
+    text, strategy, all_results = extract_text_with_multipass(image_path, max_workers=args.workers)
     
     print(f"\n📝 TEXTO EXTRAÍDO:")
     print("="*70)
@@ -1,2 +1,10 @@
-from .knowledge_base import KnowledgeBase, get_knowledge_base
 from .validator import RAGValidator
+
+
+def __getattr__(name):
+    # knowledge_base importa torch/faiss/sentence_transformers: se carga solo
+    # cuando se pide, así los procesos que solo usan pdf_extraction no lo pagan
+    if name in ('KnowledgeBase', 'get_knowledge_base'):
+        from . import knowledge_base
+        return getattr(knowledge_base, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,36 @@
 import os
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import faiss
 import numpy as np
+import torch
 from sentence_transformers import SentenceTransformer
-from pdfplumber import open as open_pdf
 # Para DOCX, necesitaríamos python-docx
 # from docx import Document
 from typing import List, Tuple
+from tqdm import tqdm
+from .pdf_extraction import extract_pdf_chunks
+
+# Fragmentos que se codifican y agregan al índice en cada bloque
+ENCODE_BLOCK_SIZE = 1024
+
+# Por debajo de este volumen total de PDFs la extracción es serial: con
+# PyMuPDF tarda menos que levantar los procesos auxiliares
+PARALLEL_EXTRACT_MIN_BYTES = 64 * 1024 * 1024
+
+
+@lru_cache(maxsize=4)
+def _load_model(model_name: str, device: str) -> SentenceTransformer:
+    """
+    Carga el modelo de embeddings una sola vez por (nombre, dispositivo).
+    Las instancias de KnowledgeBase comparten el modelo (solo se usa para inferencia).
+    """
+    model = SentenceTransformer(model_name, device=device)
+    if device == 'cuda':
+        # fp16 en GPU: mitad de memoria y más throughput en tensor cores
+        model.half()
+    return model
+
 
 class KnowledgeBase:
     def __init__(self, documents_path: str, model_name: str = 'all-MiniLM-L6-v2'):
@@ -13,7 +38,8 @@ class KnowledgeBase:
         Inicializa la base de conocimiento.
         """
         self.documents_path = documents_path
-        self.model = SentenceTransformer(model_name)
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.model = _load_model(model_name, self.device)
         self.index = None
         self.chunks = []
         self.chunk_sources = []
@@ -30,45 +56,65 @@ class KnowledgeBase:
             return
 
         print(f"Codificando {len(self.chunks)} fragmentos de texto...")
-        embeddings = self.model.encode(self.chunks, show_progress_bar=True)
         
-        dimension = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dimension)
-        self.index.add(embeddings)
+        # Embeddings normalizados: producto interno = similitud coseno.
+        # HNSW evita el recorrido completo O(N) de IndexFlatL2 en cada consulta
+        dimension = self.model.get_sentence_embedding_dimension()
+        self.index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+        self.index.hnsw.efConstruction = 80
+        # Parámetro de consulta: se fija una vez aquí para que search() no
+        # modifique el índice (lo consultan varios hilos en validate_batch)
+        self.index.hnsw.efSearch = 64
+        
+        # Codificar y agregar por bloques: nunca se tiene en memoria
+        # la matriz completa de embeddings junto con la copia del índice
+        for start in tqdm(range(0, len(self.chunks), ENCODE_BLOCK_SIZE), desc="Indexando"):
+            embeddings = self.model.encode(
+                self.chunks[start:start + ENCODE_BLOCK_SIZE],
+                batch_size=256,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                device=self.device,
+                show_progress_bar=False
+            )
+            self.index.add(embeddings.astype('float32'))
         
         print(f"Base de conocimiento construida con {self.index.ntotal} vectores.")
 
     def _extract_chunks_from_docs(self):
         """
         Extrae fragmentos de texto de los archivos PDF y DOCX.
+        Solo con varios PDFs y un volumen grande se usa un pool de procesos.
         """
-        for filename in os.listdir(self.documents_path):
-            file_path = os.path.join(self.documents_path, filename)
-            
-            if filename.lower().endswith('.pdf'):
-                try:
-                    with open_pdf(file_path) as pdf:
-                        for i, page in enumerate(pdf.pages):
-                            text = page.extract_text()
-                            if text:
-                                # Dividir en fragmentos más pequeños (párrafos)
-                                paragraphs = text.split('\n\n')
-                                for para in paragraphs:
-                                    if para.strip():
-                                        self.chunks.append(para.strip())
-                                        self.chunk_sources.append(f"{filename}, página {i+1}")
-                except Exception as e:
-                    print(f"Error al leer el PDF {filename}: {e}")
+        pdf_paths = [
+            os.path.join(self.documents_path, filename)
+            for filename in os.listdir(self.documents_path)
+            if filename.lower().endswith('.pdf')
+        ]
+        
+        total_bytes = sum(os.path.getsize(path) for path in pdf_paths)
+        
+        if len(pdf_paths) > 1 and total_bytes >= PARALLEL_EXTRACT_MIN_BYTES:
+            with ProcessPoolExecutor(max_workers=min(len(pdf_paths), os.cpu_count() or 1)) as executor:
+                extracted = list(executor.map(extract_pdf_chunks, pdf_paths))
+        else:
+            extracted = [extract_pdf_chunks(path) for path in pdf_paths]
+        
+        # map conserva el orden de los archivos
+        for chunks, sources in extracted:
+            self.chunks.extend(chunks)
+            self.chunk_sources.extend(sources)
 
-            # elif filename.lower().endswith('.docx'):
-            #     try:
-            #         doc = Document(file_path)
-            #         for para in doc.paragraphs:
-            #             if para.text.strip():
-            #                 self.chunks.append(para.text.strip())
-            #                 self.chunk_sources.append(f"{filename}")
-            #     except Exception as e:
-            #         print(f"Error al leer el DOCX {filename}: {e}")
+        # DOCX (pendiente): agregar otro extractor en pdf_extraction.py como extract_pdf_chunks
+        # elif filename.lower().endswith('.docx'):
+        #     try:
+        #         doc = Document(file_path)
+        #         for para in doc.paragraphs:
+        #             if para.text.strip():
+        #                 self.chunks.append(para.text.strip())
+        #                 self.chunk_sources.append(f"{filename}")
+        #     except Exception as e:
+        #         print(f"Error al leer el DOCX {filename}: {e}")
 
     def search(self, query: str, k: int = 3) -> List[Tuple[str, str]]:
         """
@@ -77,8 +123,8 @@ class KnowledgeBase:
         if not self.index or self.index.ntotal == 0:
             return []
             
-        query_embedding = self.model.encode([query])
-        distances, indices = self.index.search(query_embedding, k)
+        query_embedding = self.model.encode([query], normalize_embeddings=True, device=self.device)
+        scores, indices = self.index.search(query_embedding.astype('float32'), k)
         
         results = []
         for i in indices[0]:
@@ -0,0 +1,38 @@
+"""
+Extracción de texto de los PDFs de la base de conocimiento.
+Módulo liviano (sin torch/faiss/sentence_transformers) para que los
+procesos auxiliares no tengan que importar los modelos.
+"""
+import os
+import re
+import pymupdf
+from typing import List, Tuple
+
+# Separador de párrafos: línea en blanco (aunque tenga espacios)
+_PARA_RE = re.compile(r'\n\s*\n')
+
+
+def extract_pdf_chunks(file_path: str) -> Tuple[List[str], List[str]]:
+    """
+    Extrae los fragmentos (párrafos) de un PDF.
+    Retorna (fragmentos, fuentes) en el orden de las páginas.
+    """
+    filename = os.path.basename(file_path)
+    chunks, sources = [], []
+    
+    try:
+        # PyMuPDF extrae texto plano sin construir la geometría de cada carácter
+        with pymupdf.open(file_path) as pdf:
+            for i, page in enumerate(pdf):
+                text = page.get_text("text")
+                if text:
+                    # Dividir en fragmentos más pequeños (párrafos)
+                    # isspace() descarta los vacíos sin crear una copia recortada
+                    paragraphs = [para.strip() for para in _PARA_RE.split(text)
+                                  if para and not para.isspace()]
+                    chunks.extend(paragraphs)
+                    sources.extend([f"{filename}, página {i+1}"] * len(paragraphs))
+    except Exception as e:
+        print(f"Error al leer el PDF {filename}: {e}")
+    
+    return chunks, sources
@@ -1 +1 @@
-from .generate_report import generate_report
+from .generate_report import generate_report, generate_pdf_reports_parallel
@@ -3,10 +3,29 @@ Módulo para generar reportes de facturas en JSON y PDF
 Ubicación: reporter/generate_report.py
 """
 
-import json
 import os
+import orjson
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from .report_generator_pdf import generate_pdf_report
+from decimal import Decimal
+from .utils import ensure_dir
+
+
+JSON_OPTIONS = (
+    orjson.OPT_INDENT_2
+    | orjson.OPT_APPEND_NEWLINE
+    | orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_SERIALIZE_NUMPY
+)
+
+
+def _json_default(obj):
+    """Serializar tipos que orjson no soporta de forma nativa"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return str(obj)
 
 
 class ReportGenerator:
@@ -29,10 +48,13 @@ class ReportGenerator:
             data: Diccionario con datos a guardar
             output_path: Ruta del archivo de salida
         """
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        ensure_dir(os.path.dirname(output_path))
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        # orjson produce UTF-8 directamente (equivalente a ensure_ascii=False)
+        # y el archivo se escribe de una sola vez
+        payload = orjson.dumps(data, default=_json_default, option=JSON_OPTIONS)
+        with open(output_path, 'wb') as f:
+            f.write(payload)
         
         return output_path
     
@@ -40,6 +62,9 @@ class ReportGenerator:
         """
         Generar reporte en PDF usando ReportLab
         
+        Atajo para una sola factura; para varias usar to_pdf_batch,
+        que arma un único PDF con un solo doc.build.
+        
         Args:
             data: Diccionario con datos de la factura
             validation_results: Resultados de validación (opcional, se puede incluir en data)
@@ -60,7 +85,48 @@ class ReportGenerator:
             'thumbnail_path': None
         }]
         
-        # Generar PDF
+        # Generar PDF (ReportLab se importa solo cuando se necesita)
+        from .report_generator_pdf import generate_pdf_report
+        
+        return generate_pdf_report(
+            results=results,
+            output_path=output_path,
+            generation_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+    
+    def to_pdf_batch(self, data_list, file_names, output_path):
+        """
+        Generar un único PDF con varias facturas
+        
+        Todas las facturas van en el mismo documento (una por página),
+        así la preparación del documento y la escritura se hacen una sola vez.
+        
+        Args:
+            data_list: Lista de diccionarios con datos de cada factura
+            file_names: Lista de nombres de archivo fuente (mismo orden que data_list)
+            output_path: Ruta del archivo PDF de salida
+        
+        Returns:
+            str: Ruta del archivo generado
+        
+        Raises:
+            ValueError: Si data_list y file_names tienen distinta longitud
+        """
+        # zip() cortaría en silencio la lista más larga (facturas sin página)
+        if len(data_list) != len(file_names):
+            raise ValueError(
+                f"data_list ({len(data_list)}) y file_names ({len(file_names)}) "
+                "deben tener la misma longitud"
+            )
+        
+        results = [{
+            'source_file': file_name or 'factura.jpg',
+            'data': data,
+            'thumbnail_path': None
+        } for data, file_name in zip(data_list, file_names)]
+        
+        from .report_generator_pdf import generate_pdf_report
+        
         return generate_pdf_report(
             results=results,
             output_path=output_path,
@@ -73,7 +139,7 @@ def generate_report(results, template_path=None, output_path=None, generation_da
     Función helper para generar reportes (mantiene compatibilidad con código existente)
     
     Args:
-        results: Lista de resultados de facturas procesadas
+        results: Lista (o iterable) de resultados de facturas procesadas
         template_path: Ruta de plantilla (no se usa con ReportLab)
         output_path: Ruta del archivo de salida
         generation_date: Fecha de generación
@@ -84,8 +150,44 @@ def generate_report(results, template_path=None, output_path=None, generation_da
     if output_path is None:
         output_path = f"output/reports/reporte_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     
+    from .report_generator_pdf import generate_pdf_report
+    
     return generate_pdf_report(
         results=results,
         output_path=output_path,
         generation_date=generation_date
-    )
\ No newline at end of file
+    )
+
+
+def generate_pdf_reports_parallel(results_per_file, max_workers=None, generation_date=None):
+    """
+    Generar varios PDFs independientes en paralelo (uno por proceso)
+    
+    ReportLab es Python puro y retiene el GIL durante doc.build, así que
+    se usan procesos en lugar de hilos.
+    
+    Args:
+        results_per_file: Lista de tuplas (results, output_path)
+        max_workers: Número máximo de procesos (por defecto, núcleos disponibles)
+        generation_date: Fecha de generación común a todos los reportes
+    
+    Returns:
+        list: Rutas de los archivos generados (mismo orden que la entrada)
+    """
+    jobs = list(results_per_file)
+    if not jobs:
+        return []
+    
+    from .report_generator_pdf import generate_pdf_report
+    
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    
+    # Con un solo trabajo no vale la pena levantar el pool
+    if workers <= 1:
+        return [generate_pdf_report(results, output_path, generation_date)
+                for results, output_path in jobs]
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(generate_pdf_report, results, output_path, generation_date)
+                   for results, output_path in jobs]
+        return [future.result() for future in futures]
@@ -10,8 +10,145 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime
+from functools import lru_cache
 import os
 
+from .utils import ensure_dir
+
+
+# Paleta del reporte (HexColor se parsea una sola vez)
+_C_PRIMARY = colors.HexColor('#667eea')
+_C_SECONDARY = colors.HexColor('#764ba2')
+_C_BG = colors.HexColor('#f8f9fa')
+_C_OK = colors.HexColor('#155724')
+_C_WARN = colors.HexColor('#856404')
+_C_ERR = colors.HexColor('#721c24')
+
+# Nombres legibles de campos de validación (se llena a medida que aparecen)
+_FIELD_DISPLAY = {}
+
+# Tabla de escape para texto libre dentro de Paragraph (mini-XML de ReportLab)
+_XML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+
+
+def _format_money(value, moneda):
+    """Formatear un monto como '1,234.56 MONEDA' (o tal cual si no es numérico)"""
+    try:
+        return f"{float(value):,.2f} {moneda}"
+    except (ValueError, TypeError, OverflowError):
+        return f"{value} {moneda}"
+
+
+def _to_float(value):
+    """Convertir a float de forma segura (0.0 si no es numérico)"""
+    try:
+        return float(value)
+    except (ValueError, TypeError, OverflowError):
+        return 0.0
+
+
+@lru_cache(maxsize=1)
+def _build_styles():
+    """
+    Construir la hoja de estilos (base + personalizados) una sola vez
+    
+    Los ParagraphStyle no se modifican después de creados, así que todas
+    las instancias de PDFReportGenerator comparten la misma hoja.
+    """
+    styles = getSampleStyleSheet()
+    
+    # Título principal
+    styles.add(ParagraphStyle(
+        name='CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=_C_PRIMARY,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Subtítulo de factura
+    styles.add(ParagraphStyle(
+        name='InvoiceTitle',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=_C_PRIMARY,
+        spaceAfter=12,
+        spaceBefore=12,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Sección
+    styles.add(ParagraphStyle(
+        name='SectionHeader',
+        parent=styles['Heading3'],
+        fontSize=12,
+        textColor=_C_SECONDARY,
+        spaceAfter=8,
+        spaceBefore=8,
+        fontName='Helvetica-Bold'
+    ))
+    
+    # Normal con mejor espaciado
+    styles.add(ParagraphStyle(
+        name='CustomNormal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6
+    ))
+    
+    return styles
+
+
+# Estilos de tabla constantes: se construyen una vez y se comparten entre facturas
+# Grid de información general
+_INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), _C_BG),
+    ('TEXTCOLOR', (0, 0), (0, -1), _C_PRIMARY),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('PADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+# Tabla de items
+_ITEMS_TABLE_STYLE = TableStyle([
+    # Encabezado
+    ('BACKGROUND', (0, 0), (-1, 0), _C_PRIMARY),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 11),
+    ('ALIGN', (1, 0), (-1, 0), 'CENTER'),
+
+    # Cuerpo
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 9),
+    ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+    ('PADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+    # Alternar colores de fila
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, _C_BG]),
+])
+
+# Sección de totales
+_TOTALS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, -1), _C_BG),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (1, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, 1), 10),
+    ('FONTSIZE', (0, 2), (-1, 2), 12),
+    ('TEXTCOLOR', (0, 0), (0, -1), _C_PRIMARY),
+    ('TEXTCOLOR', (0, 2), (-1, 2), _C_PRIMARY),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('PADDING', (0, 0), (-1, -1), 10),
+    ('BOX', (0, 0), (-1, -1), 1, colors.grey),
+])
+
 
 class PDFReportGenerator:
     """Generador de reportes PDF para facturas procesadas"""
@@ -19,58 +156,14 @@ class PDFReportGenerator:
     def __init__(self, output_path, page_size=letter):
         self.output_path = output_path
         self.page_size = page_size
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-        
-    def _setup_custom_styles(self):
-        """Configurar estilos personalizados"""
-        # Título principal
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Subtítulo de factura
-        self.styles.add(ParagraphStyle(
-            name='InvoiceTitle',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#667eea'),
-            spaceAfter=12,
-            spaceBefore=12,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Sección
-        self.styles.add(ParagraphStyle(
-            name='SectionHeader',
-            parent=self.styles['Heading3'],
-            fontSize=12,
-            textColor=colors.HexColor('#764ba2'),
-            spaceAfter=8,
-            spaceBefore=8,
-            fontName='Helvetica-Bold'
-        ))
-        
-        # Normal con mejor espaciado
-        self.styles.add(ParagraphStyle(
-            name='CustomNormal',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=6
-        ))
+        self.styles = _build_styles()
     
     def generate_report(self, results, generation_date=None):
         """
         Generar reporte PDF completo
         
         Args:
-            results: Lista de diccionarios con información de facturas
+            results: Lista (o iterable) de diccionarios con información de facturas
             generation_date: Fecha de generación (opcional)
         """
         if generation_date is None:
@@ -90,110 +183,90 @@ class PDFReportGenerator:
         story = []
         
         # Encabezado del reporte
-        story.extend(self._create_header(generation_date))
+        self._append_header(story, generation_date)
         story.append(Spacer(1, 0.3*inch))
         
         # Procesar cada factura
         for idx, result in enumerate(results):
-            story.extend(self._create_invoice_section(result))
-            
-            # Salto de página entre facturas (excepto la última)
-            if idx < len(results) - 1:
+            # Salto de página entre facturas (no requiere conocer el total)
+            if idx > 0:
                 story.append(PageBreak())
+            
+            self._append_invoice_section(story, result)
         
         # Pie de página
-        story.extend(self._create_footer())
+        self._append_footer(story)
         
         # Construir PDF
         doc.build(story)
         
         return self.output_path
     
-    def _create_header(self, generation_date):
-        """Crear encabezado del reporte"""
-        elements = []
-        
+    def _append_header(self, story, generation_date):
+        """Agregar encabezado del reporte al story"""
         # Título (sin emoji para compatibilidad)
         title = Paragraph("Reporte de Facturas Procesadas", self.styles['CustomTitle'])
-        elements.append(title)
+        story.append(title)
         
         # Fecha de generación
         date_text = f"<i>Generado: {generation_date}</i>"
         date_para = Paragraph(date_text, self.styles['Normal'])
-        elements.append(date_para)
+        story.append(date_para)
         
         # Línea separadora
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        story.append(Spacer(1, 0.2*inch))
     
-    def _create_invoice_section(self, result):
-        """Crear sección de una factura"""
-        elements = []
+    def _append_invoice_section(self, story, result):
+        """Agregar sección de una factura al story"""
         data = result.get('data', {})
         source_file = result.get('source_file', 'N/A')
         
         # Título de la factura
         invoice_title = Paragraph(f"Factura: {source_file}", self.styles['InvoiceTitle'])
-        elements.append(invoice_title)
-        elements.append(Spacer(1, 0.1*inch))
+        story.append(invoice_title)
+        story.append(Spacer(1, 0.1*inch))
         
         # Información general
-        elements.extend(self._create_info_grid(data))
-        elements.append(Spacer(1, 0.2*inch))
+        self._append_info_grid(story, data)
+        story.append(Spacer(1, 0.2*inch))
         
         # Tabla de items
-        elements.extend(self._create_items_table(data))
-        elements.append(Spacer(1, 0.2*inch))
+        self._append_items_table(story, data)
+        story.append(Spacer(1, 0.2*inch))
         
         # Totales
-        elements.extend(self._create_totals_section(data))
-        elements.append(Spacer(1, 0.2*inch))
+        self._append_totals_section(story, data)
+        story.append(Spacer(1, 0.2*inch))
         
         # Validaciones
         if data.get('validations'):
-            elements.extend(self._create_validations_section(data))
-        
-        return elements
+            self._append_validations_section(story, data)
     
-    def _create_info_grid(self, data):
-        """Crear grid de información general"""
-        elements = []
-        
+    def _append_info_grid(self, story, data):
+        """Agregar grid de información general al story"""
         # Datos a mostrar
+        get = data.get
         info_data = [
-            ['Numero de Factura:', str(data.get('numero_factura', 'N/A'))],
-            ['Fecha de Emision:', str(data.get('fecha_emision', 'N/A'))],
-            ['Proveedor:', str(data.get('proveedor', 'N/A'))],
-            ['NIT:', str(data.get('nit_proveedor', 'N/A'))],
-            ['Direccion:', str(data.get('direccion_proveedor', 'N/A'))],
-            ['Moneda:', str(data.get('moneda', 'COP'))]
+            ['Numero de Factura:', str(get('numero_factura', 'N/A'))],
+            ['Fecha de Emision:', str(get('fecha_emision', 'N/A'))],
+            ['Proveedor:', str(get('proveedor', 'N/A'))],
+            ['NIT:', str(get('nit_proveedor', 'N/A'))],
+            ['Direccion:', str(get('direccion_proveedor', 'N/A'))],
+            ['Moneda:', str(get('moneda', 'COP'))]
         ]
         
         # Crear tabla
         table = Table(info_data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f8f9fa')),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#667eea')),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('PADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
+        table.setStyle(_INFO_TABLE_STYLE)
         
-        elements.append(table)
-        return elements
+        story.append(table)
     
-    def _create_items_table(self, data):
-        """Crear tabla de items"""
-        elements = []
-        
+    def _append_items_table(self, story, data):
+        """Agregar tabla de items al story"""
         # Encabezado
         section_title = Paragraph("Items de la Factura", self.styles['SectionHeader'])
-        elements.append(section_title)
-        elements.append(Spacer(1, 0.1*inch))
+        story.append(section_title)
+        story.append(Spacer(1, 0.1*inch))
         
         items = data.get('items', [])
         
@@ -202,88 +275,49 @@ class PDFReportGenerator:
                 "<i>No se encontraron items en esta factura</i>",
                 self.styles['CustomNormal']
             )
-            elements.append(no_items)
-            return elements
+            story.append(no_items)
+            return
         
         # Datos de la tabla
         table_data = [['Descripcion', 'Cantidad', 'Precio Unitario', 'Total']]
         moneda = data.get('moneda', 'COP')
+        format_money = _format_money
+        append_row = table_data.append
         
         for item in items:
-            desc = item.get('descripcion') or item.get('description', 'N/A')
-            cant = str(item.get('cantidad') or item.get('quantity', 'N/A'))
-            precio = item.get('precio_unitario') or item.get('unit_price', 0)
-            total = item.get('total', 0)
+            get = item.get
+            desc = get('descripcion') or get('description', 'N/A')
+            cant = str(get('cantidad') or get('quantity', 'N/A'))
+            precio = get('precio_unitario') or get('unit_price', 0)
+            total = get('total', 0)
             
             # Truncar descripción larga
-            if len(str(desc)) > 50:
-                desc = str(desc)[:47] + "..."
+            if not isinstance(desc, str):
+                desc = str(desc)
+            if len(desc) > 50:
+                desc = desc[:47] + "..."
             
-            # Formatear precios
-            try:
-                precio_fmt = f"{float(precio):,.2f} {moneda}"
-            except:
-                precio_fmt = f"{precio} {moneda}"
-            
-            try:
-                total_fmt = f"{float(total):,.2f} {moneda}"
-            except:
-                total_fmt = f"{total} {moneda}"
-            
-            table_data.append([
-                str(desc),
-                str(cant),
-                precio_fmt,
-                total_fmt
+            append_row([
+                desc,
+                cant,
+                format_money(precio, moneda),
+                format_money(total, moneda)
             ])
         
         # Crear tabla
         table = Table(table_data, colWidths=[3*inch, 0.8*inch, 1.3*inch, 1.3*inch])
-        table.setStyle(TableStyle([
-            # Encabezado
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('ALIGN', (1, 0), (-1, 0), 'CENTER'),
-            
-            # Cuerpo
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-            ('PADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Alternar colores de fila
-            *[('BACKGROUND', (0, i), (-1, i), colors.HexColor('#f8f9fa'))
-              for i in range(2, len(table_data), 2)]
-        ]))
+        table.setStyle(_ITEMS_TABLE_STYLE)
         
-        elements.append(table)
-        return elements
+        story.append(table)
     
-    def _create_totals_section(self, data):
-        """Crear sección de totales"""
-        elements = []
-        
+    def _append_totals_section(self, story, data):
+        """Agregar sección de totales al story"""
         moneda = data.get('moneda', 'COP')
         
         # Convertir a float de forma segura
-        try:
-            subtotal = float(data.get('subtotal', 0))
-        except:
-            subtotal = 0.0
-        
-        try:
-            impuestos = float(data.get('impuestos', 0))
-        except:
-            impuestos = 0.0
-        
-        try:
-            total = float(data.get('total', 0))
-        except:
-            total = 0.0
+        subtotal = _to_float(data.get('subtotal', 0))
+        impuestos = _to_float(data.get('impuestos', 0))
+        total = _to_float(data.get('total', 0))
         
         # Datos
         totals_data = [
@@ -294,30 +328,16 @@ class PDFReportGenerator:
         
         # Tabla
         table = Table(totals_data, colWidths=[4.5*inch, 2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#f8f9fa')),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, 1), 10),
-            ('FONTSIZE', (0, 2), (-1, 2), 12),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#667eea')),
-            ('TEXTCOLOR', (0, 2), (-1, 2), colors.HexColor('#667eea')),
-            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-            ('PADDING', (0, 0), (-1, -1), 10),
-            ('BOX', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
+        table.setStyle(_TOTALS_TABLE_STYLE)
         
-        elements.append(table)
-        return elements
+        story.append(table)
     
-    def _create_validations_section(self, data):
-        """Crear sección de validaciones"""
-        elements = []
-        
+    def _append_validations_section(self, story, data):
+        """Agregar sección de validaciones al story"""
         # Encabezado
         section_title = Paragraph("Validaciones Realizadas", self.styles['SectionHeader'])
-        elements.append(section_title)
-        elements.append(Spacer(1, 0.1*inch))
+        story.append(section_title)
+        story.append(Spacer(1, 0.1*inch))
         
         validations = data.get('validations', {})
         
@@ -328,41 +348,39 @@ class PDFReportGenerator:
             
             # Color según estado
             if status == 'APROBADO':
-                text_color = colors.HexColor('#155724')
+                text_color = _C_OK
             elif status == 'ADVERTENCIA':
-                text_color = colors.HexColor('#856404')
+                text_color = _C_WARN
             else:
-                text_color = colors.HexColor('#721c24')
+                text_color = _C_ERR
             
             # Título del campo
-            field_name = field.replace('_', ' ').title()
+            field_name = _FIELD_DISPLAY.get(field)
+            if field_name is None:
+                field_name = _FIELD_DISPLAY.setdefault(field, field.replace('_', ' ').title())
             field_text = f"<b>{field_name}</b> - <font color='{text_color.hexval()}'>{status}</font>"
             field_para = Paragraph(field_text, self.styles['CustomNormal'])
-            elements.append(field_para)
+            story.append(field_para)
             
             # Explicación
             if explicacion:
                 # Limpiar texto para PDF
-                explicacion_clean = str(explicacion).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+                explicacion_clean = str(explicacion).translate(_XML_ESCAPE)
                 expl_para = Paragraph(explicacion_clean, self.styles['CustomNormal'])
-                elements.append(expl_para)
+                story.append(expl_para)
             
             # Contexto documental
             if contexto and len(contexto) > 0:
                 source = contexto[0].get('source', 'N/A')
                 ref_text = f"<i>Referencia: {source}</i>"
                 ref_para = Paragraph(ref_text, self.styles['CustomNormal'])
-                elements.append(ref_para)
+                story.append(ref_para)
             
-            elements.append(Spacer(1, 0.1*inch))
-        
-        return elements
+            story.append(Spacer(1, 0.1*inch))
     
-    def _create_footer(self):
-        """Crear pie de página"""
-        elements = []
-        
-        elements.append(Spacer(1, 0.3*inch))
+    def _append_footer(self, story):
+        """Agregar pie de página al story"""
+        story.append(Spacer(1, 0.3*inch))
         
         footer_text = """
         <para align=center>
@@ -372,9 +390,7 @@ class PDFReportGenerator:
         """
         
         footer_para = Paragraph(footer_text, self.styles['Normal'])
-        elements.append(footer_para)
-        
-        return elements
+        story.append(footer_para)
 
 
 def generate_pdf_report(results, output_path, generation_date=None):
@@ -382,7 +398,7 @@ def generate_pdf_report(results, output_path, generation_date=None):
     Función helper para generar reporte PDF
     
     Args:
-        results: Lista de resultados de facturas
+        results: Lista (o iterable) de resultados de facturas
         output_path: Ruta del archivo PDF de salida
         generation_date: Fecha de generación (opcional)
     
@@ -390,7 +406,7 @@ def generate_pdf_report(results, output_path, generation_date=None):
         str: Ruta del archivo generado
     """
     # Crear directorio si no existe
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    ensure_dir(os.path.dirname(output_path))
     
     # Generar reporte
     generator = PDFReportGenerator(output_path)
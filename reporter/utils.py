@@ -0,0 +1,28 @@
+"""
+Utilidades compartidas por los generadores de reportes
+Ubicación: reporter/utils.py
+"""
+
+import os
+import threading
+
+
+# Directorios ya creados/verificados en este proceso
+_ENSURED_DIRS = set()
+_ENSURED_LOCK = threading.Lock()
+
+
+def ensure_dir(path):
+    """
+    Crear un directorio si no existe, una sola vez por proceso
+    
+    Args:
+        path: Ruta del directorio
+    """
+    if path in _ENSURED_DIRS:
+        return
+    
+    with _ENSURED_LOCK:
+        if path not in _ENSURED_DIRS:
+            os.makedirs(path, exist_ok=True)
+            _ENSURED_DIRS.add(path)